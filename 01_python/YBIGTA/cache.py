@@ -0,0 +1,73 @@
+import collections, sys
+from typing import Hashable, Optional
+
+
+# OrderedDict 노드와 딕셔너리 슬롯에 드는 대략적인 바이트 수.
+ENTRY_OVERHEAD = 100
+
+
+# 키와 값이 차지하는 대략적인 메모리. 튜플은 안에 든 원소(토큰 문자열)까지 더한다.
+def entry_size(key, value) -> int:
+    size = sys.getsizeof(key) + sys.getsizeof(value) + ENTRY_OVERHEAD
+    if isinstance(value, tuple):
+        size += sum(sys.getsizeof(item) for item in value)
+    return size
+
+
+# 항목 수(max_size)와 메모리(max_bytes) 두 가지 상한을 가진 LRU 캐시.
+# 둘 중 하나라도 넘으면 가장 오래 쓰지 않은 항목부터 버린다. None이면 그 상한은 없다.
+# get이 부를 때마다 hits/misses를 센다. clear는 항목만 비우고 카운터는 그대로 둔다.
+class LRUCache:
+    def __init__(self, max_size: Optional[int] = 100000, max_bytes: Optional[int] = None):
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self.data = collections.OrderedDict()
+        self.sizes = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default=None):
+        value = self.data.get(key)
+        if value is None:
+            self.misses += 1
+            return default
+        self.data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value) -> None:
+        if key in self.data:
+            self.bytes -= self.sizes[key]
+        size = entry_size(key, value)
+        self.data[key] = value
+        self.data.move_to_end(key)
+        self.sizes[key] = size
+        self.bytes += size
+
+        while self.data and ((self.max_size is not None and len(self.data) > self.max_size)
+                             or (self.max_bytes is not None and self.bytes > self.max_bytes)):
+            old, _ = self.data.popitem(last=False)
+            self.bytes -= self.sizes.pop(old)
+
+    def clear(self) -> None:
+        self.data.clear()
+        self.sizes.clear()
+        self.bytes = 0
+
+    def __contains__(self, key) -> bool:
+        return key in self.data
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    # 캐시 상태 요약. hit_rate는 아직 조회가 없으면 None.
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else None,
+            'entries': len(self.data),
+            'bytes': self.bytes,
+        }
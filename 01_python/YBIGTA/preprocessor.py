@@ -1,25 +1,161 @@
-class TextPreprocessor:
-    def __init__(self, texts):
-        self.texts = texts
-        self.corpus = self._preprocess_texts()
+import collections, re, unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+
+# 텍스트를 코퍼스와 같은 기준(줄바꿈 제거, 소문자화, 공백 분리)으로 단어 단위로 나눈다.
+def split_words(text):
+    return text.replace('\n', '').lower().split()
+
+
+# 텍스트를 정규화하고 단어 단위로 나누는 전처리 파이프라인. 인스턴스를 함수처럼 호출한다.
+# 문서 하나에 정규화 -> 줄바꿈 처리 -> 소문자화 -> 숫자 처리를 한 번씩 하고,
+# 미리 컴파일한 정규식 하나로 단어를 나눈다. 기본값은 split_words와 결과가 같다.
+#
+#   unicode_form      : None, 'NFC', 'NFKC', 'NFD', 'NFKD' 중 하나. 유니코드 정규화 방식.
+#   strip_newlines    : True면 예전처럼 줄바꿈을 지우고(앞뒤 줄이 붙는다), False면 공백으로 취급한다.
+#   lowercase         : 소문자화 여부.
+#   split_punctuation : True면 문장부호를 단어에서 떼어 한 글자씩 따로 둔다("said," -> "said", ",").
+#   digits            : 'keep'(단어에 붙은 그대로), 'isolate'(연속된 숫자를 따로), 'split'(숫자 한 글자씩),
+#                       'zero'(ASCII 숫자를 모두 0으로 바꿔서 숫자 모양만 남긴다)
+#   keep_whitespace   : True면 공백을 버리지 않고 뒤따르는 단어 앞에 붙인다(" world").
+#                       나눈 단어들을 그대로 이어 붙이면 원래 텍스트가 되므로 바이트 단위 BPE에서 쓴다.
+#
+# 단어 리스트를 돌려주는 함수라면 무엇이든 PreTokenizer 대신 pre_tokenizer로 넘길 수 있다.
+class PreTokenizer:
+    DIGIT_MODES = ('keep', 'isolate', 'split', 'zero')
+    ZERO_DIGITS = str.maketrans('123456789', '000000000')
+
+    def __init__(self, unicode_form=None, strip_newlines=True, lowercase=True,
+                 split_punctuation=False, digits='keep', keep_whitespace=False):
+        if digits not in self.DIGIT_MODES:
+            raise ValueError("Unknown digits mode: {}".format(digits))
+        self.unicode_form = unicode_form
+        self.strip_newlines = strip_newlines
+        self.lowercase = lowercase
+        self.split_punctuation = split_punctuation
+        self.digits = digits
+        self.keep_whitespace = keep_whitespace
+        self.pattern = self._compile()
 
-    def _preprocess_texts(self):
-        corpus = {}
+    # 옵션에 맞는 단어 분리 정규식. 공백 분리만 하면 되는 경우는 None(str.split 사용).
+    def _compile(self):
+        isolate = {'isolate': r'\d+', 'split': r'\d'}.get(self.digits)
+        if self.split_punctuation:
+            parts = [r'[^\W\d]+' if isolate else r'\w+'] + ([isolate] if isolate else []) + [r'[^\w\s]']
+        elif isolate:
+            parts = [r'[^\s\d]+', isolate]
+        elif self.keep_whitespace:
+            parts = [r'\S+']
+        else:
+            return None
+        if self.keep_whitespace:
+            return re.compile(r'\s*(?:' + '|'.join(parts) + r')|\s+')
+        return re.compile('|'.join(parts))
 
-        for text in self.texts:
+    def __call__(self, text):
+        if self.unicode_form is not None:
+            text = unicodedata.normalize(self.unicode_form, text)
+        if self.strip_newlines:
             text = text.replace('\n', '')
-            words = text.split()
+        if self.lowercase:
+            text = text.lower()
+        if self.digits == 'zero':
+            text = text.translate(self.ZERO_DIGITS)
+        if self.pattern is None:
+            return text.split()
+        return self.pattern.findall(text)
+
+
+# 바이트 단위 BPE의 기본 심볼 256개. 바이트 b는 BYTE_SYMBOLS[b] 한 글자로 나타낸다.
+# 출력 가능한 라틴-1 문자는 그대로 쓰고, 나머지(제어 문자, 공백 등)는 U+0100부터 차례로 옮겨서
+# 어떤 심볼도 공백이 아니게 한다. 그래서 코퍼스의 'c h a r s' 형식과 병합 코드를 그대로 쓸 수 있다.
+def _byte_symbols():
+    printable = set(range(ord('!'), ord('~') + 1)) | set(range(ord('¡'), ord('¬') + 1)) | set(range(ord('®'), ord('ÿ') + 1))
+    symbols = []
+    shifted = 0
+    for b in range(256):
+        if b in printable:
+            symbols.append(chr(b))
+        else:
+            symbols.append(chr(256 + shifted))
+            shifted += 1
+    return symbols
+
+
+BYTE_SYMBOLS = _byte_symbols()
+_BYTE_TO_SYMBOL = {b: symbol for b, symbol in enumerate(BYTE_SYMBOLS)}
+_SYMBOL_TO_BYTE = {ord(symbol): b for b, symbol in enumerate(BYTE_SYMBOLS)}
+
+
+# 단어를 UTF-8 바이트 심볼 문자열로. 라틴-1로 풀면 바이트 하나가 글자 하나가 되므로 translate 한 번으로 끝난다.
+def to_byte_symbols(word):
+    return word.encode('utf-8').decode('latin-1').translate(_BYTE_TO_SYMBOL)
+
+
+# 바이트 심볼 문자열을 원래 텍스트로. max_length로 잘려서 깨진 UTF-8 시퀀스는 U+FFFD로 바꾼다.
+def from_byte_symbols(symbols):
+    return symbols.translate(_SYMBOL_TO_BYTE).encode('latin-1').decode('utf-8', errors='replace')
+
+
+# 워커 프로세스에서 문서 묶음 하나의 단어 빈도를 센다.
+def count_words(texts, pre_tokenizer=split_words):
+    counts = collections.Counter()
+    for text in texts:
+        counts.update(pre_tokenizer(text))
+    return counts
+
+
+# texts는 리스트뿐 아니라 제너레이터 같은 임의의 이터러블이어도 된다.
+# 텍스트를 chunk_size개씩 읽어서 단어 빈도를 세고 바로 버리므로,
+# 메모리 사용량은 코퍼스 크기가 아니라 고유 단어 수에 비례한다.
+# num_workers가 2 이상이면 문서 묶음들을 프로세스 풀에 나눠서 센 뒤 순서대로 합친다.
+# pre_tokenizer는 텍스트를 단어 리스트로 나누는 함수(기본은 PreTokenizer()). 병렬 모드에서는 pickle 가능해야 한다.
+# byte_level=True면 단어를 글자 대신 UTF-8 바이트 심볼로 나누고 </w>를 붙이지 않는다('h e l l o').
+class TextPreprocessor:
+    def __init__(self, texts, chunk_size=1000, num_workers=None, pre_tokenizer=None, byte_level=False):
+        if isinstance(texts, str):
+            texts = [texts]
+        self.chunk_size = chunk_size
+        self.num_workers = num_workers
+        self.pre_tokenizer = pre_tokenizer if pre_tokenizer is not None else PreTokenizer()
+        self.byte_level = byte_level
+        self.corpus = self._preprocess_texts(texts)
+
+    def _chunks(self, texts):
+        texts = iter(texts)
+        while True:
+            chunk = list(islice(texts, self.chunk_size))
+            if not chunk:
+                return
+            yield chunk
+
+    def _preprocess_texts(self, texts):
+        if self.num_workers and self.num_workers > 1:
+            counts = self._count_parallel(texts)
+        else:
+            counts = collections.Counter()
+            for chunk in self._chunks(texts):
+                counts.update(count_words(chunk, self.pre_tokenizer))
 
-            for word in words:
-                word_processed = ' '.join(list(word.lower())) + ' </w>'
-                
-                if word_processed in corpus:
-                    corpus[word_processed] += 1
-                else:
-                    corpus[word_processed] = 1
+        # 단어를 'c h a r s </w>' 형태로 바꾸는 건 고유 단어마다 한 번만 한다.
+        # Counter는 처음 등장한 순서를 유지하므로 코퍼스의 순서도 그대로다.
+        if self.byte_level:
+            return {' '.join(to_byte_symbols(word)): count for word, count in counts.items()}
+        return {' '.join(word) + ' </w>': count for word, count in counts.items()}
 
-        return corpus
+    # 한 번에 num_workers * 2개 묶음까지만 풀에 올려서, 제너레이터 입력도 전부 읽어 들이지 않는다.
+    def _count_parallel(self, texts):
+        counts = collections.Counter()
+        pending = collections.deque()
+        with ProcessPoolExecutor(max_workers=self.num_workers) as executor:
+            for chunk in self._chunks(texts):
+                pending.append(executor.submit(count_words, chunk, self.pre_tokenizer))
+                if len(pending) >= self.num_workers * 2:
+                    counts.update(pending.popleft().result())
+            while pending:
+                counts.update(pending.popleft().result())
+        return counts
 
     def get_corpus(self):
-        print(self.corpus)
-        return self.corpus
\ No newline at end of file
+        return self.corpus
@@ -0,0 +1,329 @@
+import mmap, os, pickle, struct, sys
+from array import array
+from bisect import bisect_left
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+
+# 학습한 BPE 모델(심볼 테이블 + 병합 목록)의 바이너리 포맷.
+#
+#   헤더      : magic(4) version(u32) n_symbols(u32) n_merges(u32) blob_size(u32) flags(u32)
+#   offsets  : u32 * (n_symbols + 1)   심볼 i는 blob[offsets[i]:offsets[i+1]] (UTF-8)
+#   blob     : 심볼 문자열들을 이어 붙인 바이트
+#   merges   : u32 * 2 * n_merges      병합 순서대로 (왼쪽 심볼 ID, 오른쪽 심볼 ID)
+#   keys     : u64 * n_merges          (왼쪽 << 32 | 오른쪽)을 정렬한 값. 페어 -> 순위 이분 탐색용
+#   ranks    : u32 * n_merges          keys와 같은 순서의 병합 순위
+#
+# flags의 비트 0(FLAG_BYTE_LEVEL)은 바이트 단위 BPE 모델을 뜻한다. 나머지 비트는 0으로 둔다.
+#
+# 모든 섹션은 8바이트 경계에 맞춰져 있어서 파일을 mmap한 뒤 memoryview.cast로 바로 읽을 수 있다.
+# 숫자는 모두 리틀 엔디언이다. 빅 엔디언 기계에서는 읽을 때 바이트 순서를 바꾼 복사본을 만든다.
+# 여러 프로세스가 같은 파일을 mmap하면 병합 테이블은 페이지 캐시 하나를 공유한다.
+MAGIC = b"YBPE"
+VERSION = 1
+HEADER = struct.Struct("<4s5I")
+FLAG_BYTE_LEVEL = 1
+
+
+def _align(n: int) -> int:
+    return (n + 7) & ~7
+
+
+def _little_endian(buf: array) -> bytes:
+    if sys.byteorder != "little":
+        buf = array(buf.typecode, buf)
+        buf.byteswap()
+    return buf.tobytes()
+
+
+# 파일의 리틀 엔디언 배열을 typecode 배열로 읽는다. 리틀 엔디언 기계에서는 복사 없이 cast한 memoryview,
+# 빅 엔디언 기계에서는 바이트 순서를 바꾼 복사본의 memoryview다.
+def _from_little_endian(view: memoryview, typecode: str) -> memoryview:
+    if sys.byteorder == "little":
+        return view.cast(typecode)
+    buf = array(typecode, view.tobytes())
+    buf.byteswap()
+    return memoryview(buf)
+
+
+# 심볼 테이블과 병합 목록을 path에 저장. 임시 파일에 쓴 뒤 교체하므로 중간에 실패해도 기존 파일은 그대로다.
+def save_model(path: str, symbols: List[str], merges: List[Tuple[int, int]], flags: int = 0) -> None:
+    encoded = [symbol.encode("utf-8") for symbol in symbols]
+    offsets = array("I", [0])
+    for data in encoded:
+        offsets.append(offsets[-1] + len(data))
+    blob = b"".join(encoded)
+
+    pairs = array("I")
+    for left, right in merges:
+        pairs.extend((left, right))
+    order = sorted(range(len(merges)), key=lambda rank: (merges[rank][0] << 32) | merges[rank][1])
+    keys = array("Q", [(merges[rank][0] << 32) | merges[rank][1] for rank in order])
+    ranks = array("I", order)
+
+    sections = [_little_endian(offsets), blob, _little_endian(pairs), _little_endian(keys), _little_endian(ranks)]
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(symbols), len(merges), len(blob), flags))
+        for data in sections:
+            f.write(data)
+            f.write(b"\0" * (_align(len(data)) - len(data)))
+    os.replace(tmp_path, path)
+
+
+# mmap한 모델 파일 위에서 동작하는 읽기 전용 병합 테이블. record 딕셔너리와 같은 방식으로 쓸 수 있다.
+# 키는 (왼쪽 심볼, 오른쪽 심볼) 문자열 페어, 값은 병합 순위다.
+class MergeTable:
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, n_symbols, n_merges, blob_size, self.flags = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError("{} is not a BPE model file".format(path))
+        if version != VERSION:
+            raise ValueError("Unsupported BPE model version: {}".format(version))
+
+        view = memoryview(self._mmap)
+        pos = HEADER.size
+        offsets = _from_little_endian(view[pos:pos + 4 * (n_symbols + 1)], "I")
+        pos += _align(4 * (n_symbols + 1))
+        blob = self._mmap[pos:pos + blob_size]
+        pos += _align(blob_size)
+        self._merges = _from_little_endian(view[pos:pos + 8 * n_merges], "I")
+        pos += _align(8 * n_merges)
+        self._keys = _from_little_endian(view[pos:pos + 8 * n_merges], "Q")
+        pos += _align(8 * n_merges)
+        self._ranks = _from_little_endian(view[pos:pos + 4 * n_merges], "I")
+
+        self.symbols = [blob[offsets[i]:offsets[i+1]].decode("utf-8") for i in range(n_symbols)]
+        self.symbol_ids = {}
+        for i, symbol in enumerate(self.symbols):
+            self.symbol_ids.setdefault(symbol, i)
+
+    def get(self, pair: Tuple[str, str], default=None):
+        left = self.symbol_ids.get(pair[0])
+        right = self.symbol_ids.get(pair[1])
+        if left is None or right is None:
+            return default
+        key = (left << 32) | right
+        i = bisect_left(self._keys, key)
+        if i < len(self._keys) and self._keys[i] == key:
+            return self._ranks[i]
+        return default
+
+    def __getitem__(self, pair: Tuple[str, str]) -> int:
+        rank = self.get(pair)
+        if rank is None:
+            raise KeyError(pair)
+        return rank
+
+    def __contains__(self, pair) -> bool:
+        return self.get(pair) is not None
+
+    def __len__(self) -> int:
+        return len(self._ranks)
+
+    # 병합 순서대로 페어를 돌려준다.
+    def __iter__(self) -> Iterator[Tuple[str, str]]:
+        symbols = self.symbols
+        merges = self._merges
+        for rank in range(len(self)):
+            yield symbols[merges[2 * rank]], symbols[merges[2 * rank + 1]]
+
+    def keys(self) -> Iterator[Tuple[str, str]]:
+        return iter(self)
+
+    def items(self) -> Iterator[Tuple[Tuple[str, str], int]]:
+        return ((pair, rank) for rank, pair in enumerate(self))
+
+    # 프로세스 풀로 넘길 때는 경로만 보내고, 받는 쪽에서 같은 파일을 다시 mmap한다.
+    def __reduce__(self):
+        return (MergeTable, (self.path,))
+
+
+# 학습 중간 상태를 path에 저장. 임시 파일에 다 쓰고 디스크에 반영한 뒤 교체하므로,
+# 저장 도중 프로세스가 죽어도 path에는 항상 완전한 체크포인트가 남는다.
+def save_checkpoint(path: str, state: dict) -> None:
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path: str) -> dict:
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+# 문서 여러 개를 길이 접두 방식으로 이어 붙인 아카이브. 작은 파일 수만 개 대신 파일 하나를 순서대로 읽는다.
+#
+#   헤더  : magic(4) version(u32) n_docs(u32) flags(u32)
+#   문서  : (u64 바이트 길이, UTF-8 본문) * n_docs
+#
+# flags의 비트 0(DOCS_COMPLETE)은 원본 디렉토리의 문서를 빠짐없이 담았다는 뜻이다.
+DOCS_MAGIC = b"YDOC"
+DOCS_VERSION = 1
+DOCS_HEADER = struct.Struct("<4s3I")
+DOC_LENGTH = struct.Struct("<Q")
+DOCS_COMPLETE = 1
+
+
+# 문서들을 path에 저장. save_model과 마찬가지로 임시 파일에 다 쓴 뒤 교체한다.
+def save_documents(path: str, texts: Iterable[str], flags: int = 0) -> None:
+    tmp_path = path + ".tmp"
+    count = 0
+    with open(tmp_path, "wb") as f:
+        f.write(DOCS_HEADER.pack(DOCS_MAGIC, DOCS_VERSION, 0, flags))
+        for text in texts:
+            data = text.encode("utf-8")
+            f.write(DOC_LENGTH.pack(len(data)))
+            f.write(data)
+            count += 1
+        f.seek(0)
+        f.write(DOCS_HEADER.pack(DOCS_MAGIC, DOCS_VERSION, count, flags))
+    os.replace(tmp_path, path)
+
+
+# 아카이브 헤더의 (문서 수, flags).
+def document_info(path: str) -> Tuple[int, int]:
+    with open(path, "rb") as f:
+        magic, version, n_docs, flags = DOCS_HEADER.unpack(f.read(DOCS_HEADER.size))
+    if magic != DOCS_MAGIC:
+        raise ValueError("{} is not a document archive".format(path))
+    if version != DOCS_VERSION:
+        raise ValueError("Unsupported document archive version: {}".format(version))
+    return n_docs, flags
+
+
+# 아카이브에서 앞에서부터 n개(기본은 전부)의 문서를 저장된 순서대로 읽는다.
+def load_documents(path: str, n: Optional[int] = None) -> List[str]:
+    n_docs, _ = document_info(path)
+    if n is not None:
+        n_docs = min(n, n_docs)
+    texts = []
+    with open(path, "rb", buffering=1 << 20) as f:
+        f.seek(DOCS_HEADER.size)
+        for _ in range(n_docs):
+            size, = DOC_LENGTH.unpack(f.read(DOC_LENGTH.size))
+            texts.append(f.read(size).decode("utf-8"))
+    return texts
+
+
+# 토큰 ID 샤드. 데이터 로더가 파일을 mmap해서 문서 단위로 잘라 쓸 수 있도록 토큰과 인덱스를 따로 저장한다.
+#
+#   {prefix}_{샤드 번호:05d}.bin : 토큰 ID를 이어 붙인 배열. vocab이 65536개 이하면 u16, 아니면 u32 (리틀 엔디언)
+#   {prefix}_{샤드 번호:05d}.idx : 헤더 magic(4) version(u32) itemsize(u32) n_docs(u32)
+#                                 + u64 * (n_docs + 1)  문서 i는 토큰 [offsets[i], offsets[i+1])
+#
+# 문서는 샤드 사이에 나뉘지 않는다. 샤드가 shard_tokens를 넘길 문서는 다음 샤드에서 시작한다.
+SHARD_MAGIC = b"YTOK"
+SHARD_VERSION = 1
+SHARD_HEADER = struct.Struct("<4s3I")
+
+
+# 문서별 토큰 ID 배열을 받아서 샤드 파일로 쓴다. 토큰은 buffer_tokens 크기의 고정 버퍼에 모았다가
+# 버퍼가 찰 때마다 파일에 쓰므로, 메모리 사용량은 문서 수나 샤드 크기와 상관없다.
+# 각 샤드는 임시 파일에 다 쓴 뒤 교체한다. with 문으로 쓰거나 마지막에 close를 불러야 한다.
+class ShardWriter:
+    def __init__(self, prefix: str, vocab_size: int, shard_tokens: int = 1 << 28, buffer_tokens: int = 1 << 20):
+        self.prefix = prefix
+        self.typecode = "H" if vocab_size <= 1 << 16 else "I"
+        self.shard_tokens = shard_tokens
+        self.buffer = array(self.typecode, bytes(array(self.typecode).itemsize * buffer_tokens))
+        self.fill = 0
+        self.file = None
+        self.offsets = array("Q", [0])
+        self.paths: List[str] = []
+        self.n_docs = 0
+        self.n_tokens = 0
+
+    def __enter__(self) -> "ShardWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def add(self, ids: array) -> None:
+        if self.file is None or (self.offsets[-1] and self.offsets[-1] + len(ids) > self.shard_tokens):
+            self._next_shard()
+        if ids.typecode != self.typecode:
+            ids = array(self.typecode, ids)
+
+        buffer = self.buffer
+        pos = 0
+        while pos < len(ids):
+            n = min(len(ids) - pos, len(buffer) - self.fill)
+            buffer[self.fill:self.fill + n] = ids[pos:pos + n]
+            self.fill += n
+            pos += n
+            if self.fill == len(buffer):
+                self._flush()
+        self.offsets.append(self.offsets[-1] + len(ids))
+        self.n_docs += 1
+        self.n_tokens += len(ids)
+
+    def _flush(self) -> None:
+        if sys.byteorder == "little":
+            self.file.write(memoryview(self.buffer)[:self.fill])
+        else:
+            self.file.write(_little_endian(self.buffer[:self.fill]))
+        self.fill = 0
+
+    def _path(self, shard: int) -> str:
+        return "{}_{:05d}".format(self.prefix, shard)
+
+    def _next_shard(self) -> None:
+        self._finish_shard()
+        path = self._path(len(self.paths))
+        self.paths.append(path)
+        self.file = open(path + ".bin.tmp", "wb")
+
+    def _finish_shard(self) -> None:
+        if self.file is None:
+            return
+        self._flush()
+        self.file.close()
+        self.file = None
+        path = self.paths[-1]
+        with open(path + ".idx.tmp", "wb") as f:
+            f.write(SHARD_HEADER.pack(SHARD_MAGIC, SHARD_VERSION, self.buffer.itemsize, len(self.offsets) - 1))
+            f.write(_little_endian(self.offsets))
+        os.replace(path + ".bin.tmp", path + ".bin")
+        os.replace(path + ".idx.tmp", path + ".idx")
+        self.offsets = array("Q", [0])
+
+    def close(self) -> None:
+        self._finish_shard()
+
+
+# ShardWriter로 쓴 샤드 하나를 mmap해서 읽는다. path는 확장자를 뺀 샤드 경로({prefix}_00000).
+# shard[i]는 문서 i의 토큰 ID memoryview라서 복사 없이 슬라이스할 수 있다.
+class TokenShard:
+    def __init__(self, path: str):
+        self.path = path
+        with open(path + ".idx", "rb") as f:
+            self._index = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, itemsize, n_docs = SHARD_HEADER.unpack_from(self._index, 0)
+        if magic != SHARD_MAGIC:
+            raise ValueError("{} is not a token shard index".format(path))
+        if version != SHARD_VERSION:
+            raise ValueError("Unsupported token shard version: {}".format(version))
+        index = memoryview(self._index)[SHARD_HEADER.size:SHARD_HEADER.size + 8 * (n_docs + 1)]
+        self.offsets = _from_little_endian(index, "Q")
+
+        typecode = "H" if itemsize == 2 else "I"
+        if self.offsets[-1] == 0:
+            self.tokens = memoryview(array(typecode))
+        else:
+            with open(path + ".bin", "rb") as f:
+                self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.tokens = _from_little_endian(memoryview(self._data), typecode)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> memoryview:
+        return self.tokens[self.offsets[i]:self.offsets[i + 1]]
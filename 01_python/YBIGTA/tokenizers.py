@@ -1,29 +1,186 @@
-import re, collections
-from typing import Optional, Union, List, Tuple
+import re, collections, heapq, time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, Optional, Union, List, Tuple
 
-from YBIGTA.preprocessor import TextPreprocessor
+from YBIGTA.cache import LRUCache
+from YBIGTA.preprocessor import TextPreprocessor, PreTokenizer, BYTE_SYMBOLS, to_byte_symbols, from_byte_symbols
+from YBIGTA.trainer import BPETrainer, ArrayBPETrainer
+from YBIGTA.serialization import MergeTable, FLAG_BYTE_LEVEL, save_model, save_checkpoint, load_checkpoint
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# encode_batch에서 프로세스 풀을 쓰기 시작하는 고유 단어 수.
+PARALLEL_MIN_WORDS = 20000
+
+# 특수 토큰 이름에는 공백을 넣는다. 코퍼스 키는 심볼을 공백으로 구분하므로 학습한 심볼이나 단어는 공백을 가질 수 없고,
+# 그래서 "<pad>" 같은 텍스트를 학습해도 특수 토큰과 같은 ID로 합쳐지지 않는다.
+PAD_TOKEN = "< pad >"
+UNK_TOKEN = "< unk >"
+# 예전 모델 파일이 쓰던 특수 토큰 이름. load할 때 위 이름으로 바꾼다.
+LEGACY_SPECIAL_TOKENS = ["<pad>", "<unk>"]
 
 
 # BPETokenizer와 WordTokenizer 클래스의 부모 클래스 정의
 class Tokenizer:
+    byte_level = False
+
     # 토크나이저를 훈련시킬 기본 코퍼스로 초기화.
-    def __init__(self, corpus: Optional[Union[List[str], str]] = None):
+    # 코퍼스는 문자열 리스트뿐 아니라 문서를 하나씩 내주는 제너레이터여도 된다.
+    # num_workers를 주면 단어 빈도를 프로세스 풀에서 병렬로 센다.
+    # pre_tokenizer는 학습과 토크나이즈 모두에서 텍스트를 단어로 나누는 함수(기본은 PreTokenizer()).
+    def __init__(self, corpus: Optional[Union[Iterable[str], str]] = None,
+                 num_workers: Optional[int] = None,
+                 pre_tokenizer: Optional[Callable[[str], List[str]]] = None):
         self.record = {}
-        processor = TextPreprocessor(corpus)
-        self.corpus = processor.get_corpus()
+        self.vocab = None
+        self.id_to_token = []
+        self.pre_tokenizer = pre_tokenizer if pre_tokenizer is not None else PreTokenizer()
+        if corpus is None:
+            self.corpus = {}
+        else:
+            processor = TextPreprocessor(corpus, num_workers=num_workers, pre_tokenizer=self.pre_tokenizer,
+                                         byte_level=self.byte_level)
+            self.corpus = processor.get_corpus()
 
-    # 코퍼스를 새롭게 추가.
-    def add_corpus(self, corpus: Union[List[str], str]):
-        processor = TextPreprocessor(corpus)
-        self.corpus = processor.get_corpus()
-        
+    # 코퍼스를 새롭게 추가. 새 텍스트의 단어 빈도만 세서 기존 코퍼스에 더하고, 예전 텍스트는 다시 처리하지 않는다.
+    # 이미 학습한 병합이 있으면 새 단어들에만 병합을 적용해서 기존 코퍼스와 같은 상태로 맞춘다.
+    def add_corpus(self, corpus: Union[Iterable[str], str], num_workers: Optional[int] = None):
+        processor = TextPreprocessor(corpus, num_workers=num_workers, pre_tokenizer=self.pre_tokenizer,
+                                     byte_level=self.byte_level)
+        new_corpus = processor.get_corpus()
+        if self.record:
+            new_corpus = self._apply_record(new_corpus)
+
+        for word, freq in new_corpus.items():
+            self.corpus[word] = self.corpus.get(word, 0) + freq
+        self.vocab = None
+
+    # 전처리된 코퍼스('l o w </w>': 빈도)에 지금까지 학습한 병합을 적용한다.
+    def _apply_record(self, corpus: Dict[str, int]) -> Dict[str, int]:
+        return corpus
+
+    # 토큰 -> ID 사전을 새로 만든다. 자식 클래스에서 구현.
+    def _build_vocab(self) -> Dict[str, int]:
+        raise NotImplementedError
+
+    # 토큰 목록으로 vocab과 id_to_token을 만든다. 중복된 토큰은 처음 나온 ID만 쓰므로 ID는 빈틈없이 이어진다.
+    def _set_vocab(self, tokens: Iterable[str]) -> Dict[str, int]:
+        vocab = {}
+        for token in tokens:
+            if token not in vocab:
+                vocab[token] = len(vocab)
+        self.vocab = vocab
+        self.id_to_token = list(vocab)
+        return vocab
+
+    # 토큰 -> ID 사전. train이나 add_corpus로 바뀌었으면 다시 만든다.
+    def get_vocab(self) -> Dict[str, int]:
+        return self.vocab if self.vocab is not None else self._build_vocab()
+
+    # ID 배열을 return_type에 맞게 변환. 'array'는 array('I'), 'numpy'는 int32 ndarray, 'list'는 파이썬 리스트.
+    def _convert_ids(self, ids: array, return_type: str):
+        if return_type == 'array':
+            return ids
+        if return_type == 'list':
+            return ids.tolist()
+        if return_type == 'numpy':
+            if np is None:
+                raise ImportError("return_type='numpy' requires numpy")
+            return np.frombuffer(ids, dtype=np.uint32).astype(np.int32)
+        raise ValueError("Unknown return_type: {}".format(return_type))
+
+    # 인코딩한 배치에 max_length 자르기와 padding을 적용하고 return_type으로 변환. encode_batch의 기본은 encode처럼 'array'다.
+    # padding=True면 가장 긴 문서(max_length가 있으면 max_length) 길이에 맞춰 <pad> ID로 채운다.
+    # return_type='numpy'와 padding을 같이 쓰면 (문서 수, 길이) 모양의 int32 배열 하나를 돌려준다.
+    def _finish_batch(self, batch: List[array], padding: bool, max_length: Optional[int], return_type: str):
+        if max_length is not None:
+            for ids in batch:
+                del ids[max_length:]
+        if padding and batch:
+            target = max_length if max_length is not None else max(len(ids) for ids in batch)
+            pad_id = self.vocab[PAD_TOKEN]
+            for ids in batch:
+                ids.extend([pad_id] * (target - len(ids)))
+            if return_type == 'numpy' and np is not None:
+                return np.stack([self._convert_ids(ids, return_type) for ids in batch])
+        return [self._convert_ids(ids, return_type) for ids in batch]
+
+    # 텍스트 하나를 토큰 ID 배열로 인코딩. 기본은 파이썬 리스트보다 훨씬 작은 array('I')다.
+    def encode(self, text: str, return_type: str = 'array'):
+        return self.encode_batch([text], return_type=return_type)[0]
+
+
+# 단어 단위 토크나이저. 코퍼스의 단어들을 빈도 순으로 정렬해 ID를 붙이고,
+# min_freq보다 적게 나오거나 max_size(특수 토큰 포함)를 넘는 단어는 <unk>으로 처리한다.
 class WordTokenizer(Tokenizer):
-    def __init__(self, corpus):
-        super().__init__(corpus)
+    def __init__(self, corpus=None, min_freq: int = 1, max_size: Optional[int] = None,
+                 num_workers: Optional[int] = None, pre_tokenizer: Optional[Callable[[str], List[str]]] = None):
+        super().__init__(corpus, num_workers, pre_tokenizer)
+        self.min_freq = min_freq
+        self.max_size = max_size
+
+    # 단어 사전을 만든다. BPETokenizer와 같은 인터페이스를 위해 n_iter를 받지만 쓰지는 않는다.
+    def train(self, n_iter: Optional[int] = None) -> None:
+        self._build_vocab()
+
+    # 빈도가 같은 단어는 코퍼스에 먼저 등장한 순서를 따른다.
+    def _build_vocab(self) -> Dict[str, int]:
+        counts = {}
+        for word, freq in self.corpus.items():
+            if freq >= self.min_freq:
+                counts[''.join(word.split()[:-1])] = freq
+        words = sorted(counts, key=counts.get, reverse=True)
+        if self.max_size is not None:
+            words = words[:max(self.max_size - 2, 0)]
+        return self._set_vocab([PAD_TOKEN, UNK_TOKEN] + words)
+
+    # 텍스트를 단어 단위로 나누고, 사전에 없는 단어는 <unk>으로 바꾼다.
+    def tokenize(self, text: Union[List[str], str]) -> List[str]:
+        if not isinstance(text, str):
+            text = ' '.join(text)
+        vocab = self.get_vocab()
+        return [word if word in vocab else UNK_TOKEN for word in self.pre_tokenizer(text)]
+
+    # 단어를 나눈 뒤 사전 조회만 하므로 병렬 처리 없이도 충분히 빠르다. num_workers는 인터페이스 호환용.
+    def encode_batch(self, texts: Union[List[str], str], num_workers: Optional[int] = None,
+                     padding: bool = False, max_length: Optional[int] = None,
+                     return_type: str = 'array'):
+        if isinstance(texts, str):
+            texts = [texts]
+        get = self.get_vocab().get
+        unk_id = self.vocab[UNK_TOKEN]
+
+        batch = [array('I', [get(word, unk_id) for word in self.pre_tokenizer(text)]) for text in texts]
+        return self._finish_batch(batch, padding, max_length, return_type)
+
+    def decode(self, ids: Iterable[int]) -> str:
+        self.get_vocab()
+        pad_id = self.vocab[PAD_TOKEN]
+        return ' '.join(self.id_to_token[i] for i in ids if i != pad_id)
+
 
 class BPETokenizer(Tokenizer):
-    def __init__(self, corpus):
-        super().__init__(corpus)
+    # cache_size, cache_bytes: 단어 -> 토큰 캐시(cache)와 단어 -> 토큰 ID 캐시(id_cache)의 항목 수, 메모리 상한.
+    # 토큰 캐시는 train으로 병합이 바뀌면, ID 캐시는 vocab이 다시 만들어지면(train, add_corpus 이후) 비워진다.
+    # byte_level=True면 글자 대신 UTF-8 바이트(기본 심볼 256개 고정)로 학습하고 토크나이즈한다.
+    # 처음 보는 문자도 <unk> 없이 인코딩되고, 기본 pre_tokenizer가 대소문자와 공백을 그대로 두기 때문에
+    # decode(encode(text)) == text가 항상 성립한다. 단어 끝은 </w> 대신 단어 앞에 붙은 공백으로 구분한다.
+    def __init__(self, corpus=None, cache_size: int = 100000, num_workers: Optional[int] = None,
+                 pre_tokenizer: Optional[Callable[[str], List[str]]] = None, byte_level: bool = False,
+                 cache_bytes: Optional[int] = None):
+        self.byte_level = byte_level
+        self.cache = LRUCache(cache_size, cache_bytes)
+        self.id_cache = LRUCache(cache_size, cache_bytes)
+        if byte_level and pre_tokenizer is None:
+            pre_tokenizer = PreTokenizer(strip_newlines=False, lowercase=False, keep_whitespace=True)
+        super().__init__(corpus, num_workers, pre_tokenizer)
+        self.stop_reason = None
         
     # 코퍼스로부터 캐릭터 페어 별로 빈도 수를 받아오기.
     def get_stats(self, corpus):
@@ -38,7 +195,7 @@ class BPETokenizer(Tokenizer):
     def merge_vocab(self, pair, v_in):
         v_out = {}
         bigram = re.escape(' '.join(pair))
-        p = re.compile(r'(?<!\\S)' + bigram + r'(?!\\S)')
+        p = re.compile(r'(?<!\S)' + bigram + r'(?!\S)')
         for word in v_in:
             w_out = p.sub(''.join(pair), word)
             v_out[w_out] = v_in[word]
@@ -46,19 +203,164 @@ class BPETokenizer(Tokenizer):
     
     # 코퍼스를 기준으로 가장 빈도 수가 높은 페어들을 순서대로 병합한다.
     # 페어 병합 순서대로 토큰 ID를 지정하고, record에 저장한다.
-    def train(self, n_iter: int) -> None:
-        
-        for i in range(n_iter):
-            pairs = self.get_stats(self.corpus)
-            best = max(pairs, key=pairs.get)
-            self.corpus = self.merge_vocab(best, self.corpus)
-            self.record[best] = i
-            
-            #print("----------------------------------------------------------------------------")
-            #print("Iteration     : ",i)
-            #print("New Merge     : ", best)
-            #print("Updated Corpus: ", self.corpus)
-            #print("Record        : ", self.record)
+    # engine='incremental'은 페어 빈도 테이블을 한 번만 만들고 병합된 단어만 갱신하는 BPETrainer를 쓰고,
+    # engine='array'는 같은 방식이지만 단어를 정수 심볼 배열로 저장하는 ArrayBPETrainer를 쓴다.
+    # engine='naive'는 매 반복마다 get_stats와 merge_vocab으로 코퍼스 전체를 다시 계산한다.
+    # stats='numpy'는 engine='array'에서 처음 페어 빈도를 셀 때 numpy로 한꺼번에 센다(numpy 필요).
+    # recount_every를 주면 그만큼 병합할 때마다 페어 테이블을 처음부터 다시 세서 쌓인 힙 원소를 정리한다.
+    # 어느 쪽이든 병합 순서는 바뀌지 않는다.
+    #
+    # 학습은 다음 중 하나가 먼저 만족되면 멈추고, 그 이유를 돌려준다(self.stop_reason에도 저장).
+    #   'n_iter'        : n_iter번 병합했다.
+    #   'vocab_size'    : 어휘 크기(특수 토큰, 기본 문자 포함)가 vocab_size에 도달했다.
+    #   'min_frequency' : 가장 빈도 수가 높은 페어도 min_frequency번보다 적게 나온다.
+    #   'exhausted'     : 더 병합할 페어가 없다.
+    #
+    # checkpoint_path를 주면 checkpoint_every번 병합마다, 또는 checkpoint_interval초마다(그리고 학습이 끝났을 때)
+    # record와 병합 중인 코퍼스를 저장한다. resume_from으로 그 체크포인트를 주면 같은 인자로 학습을 이어가고,
+    # 병합 순서는 중단 없이 학습한 것과 같다. checkpoint_path를 생략하면 resume_from 경로에 계속 저장한다.
+    #
+    # callback을 주면 report_every번 병합마다, 그리고 학습이 끝날 때 진행 상황 딕셔너리를 넘겨준다.
+    #   merges, merges_per_sec(직전 보고 이후), best_pair, best_frequency, vocab_size,
+    #   stats_sec(최빈 페어 찾기에 쓴 시간), merge_sec(병합에 쓴 시간), elapsed_sec, stop_reason(마지막 보고에만)
+    # callback이 없으면 시간 측정도 하지 않는다.
+    def train(self, n_iter: Optional[int] = None, engine: str = 'incremental',
+              min_frequency: int = 1, vocab_size: Optional[int] = None,
+              checkpoint_path: Optional[str] = None, checkpoint_every: Optional[int] = None,
+              checkpoint_interval: Optional[float] = None, resume_from: Optional[str] = None,
+              callback: Optional[Callable[[dict], None]] = None, report_every: int = 1000,
+              stats: str = 'dict', recount_every: Optional[int] = None) -> str:
+        if engine not in ('incremental', 'array', 'naive'):
+            raise ValueError("Unknown training engine: {}".format(engine))
+        if stats != 'dict' and engine != 'array':
+            raise ValueError("stats='{}' requires engine='array'".format(stats))
+
+        if resume_from is not None:
+            state = load_checkpoint(resume_from)
+            if state.get('byte_level', False) != self.byte_level:
+                raise ValueError("Checkpoint {} was trained with byte_level={}".format(resume_from, not self.byte_level))
+            self.record = state['record']
+            self.corpus = state['corpus']
+            start = state['start']
+            checkpoint_path = checkpoint_path or resume_from
+        else:
+            if not isinstance(self.record, dict):
+                self.record = dict(self.record.items())
+            start = len(self.record)
+        self.cache.clear()
+        track = callback is not None
+        vocab = dict(self._build_vocab()) if vocab_size is not None or track else None
+        self.vocab = None
+
+        clock = time.perf_counter
+        began = last_report = clock()
+        stats_sec = merge_sec = 0.0
+        best, freq = None, 0
+        pending = None
+
+        # 진행 상황 딕셔너리와 만든 시각. 주기적인 보고는 다음 병합을 시작할 때 넘겨주고, 그 전에 학습이 멈추면
+        # 마지막 보고에 그 merges_per_sec를 넣어서 하나로 합친다. 같은 병합 수를 두 번 보고하지 않는다.
+        def progress(merges, reported, reason=None):
+            now = clock()
+            return now, {
+                'merges': merges,
+                'merges_per_sec': (merges - reported) / (now - last_report) if merges > reported else None,
+                'best_pair': best,
+                'best_frequency': freq,
+                'vocab_size': len(vocab),
+                'stats_sec': stats_sec,
+                'merge_sec': merge_sec,
+                'elapsed_sec': now - began,
+                'stop_reason': reason,
+            }
+
+        if engine == 'naive':
+            trainer = None
+        elif engine == 'array':
+            trainer = ArrayBPETrainer(self.corpus, BYTE_SYMBOLS if self.byte_level else (), stats)
+        else:
+            trainer = BPETrainer(self.corpus)
+        reason = 'n_iter'
+        i = reported = len(self.record) - start
+        last_checkpoint = time.monotonic()
+        while n_iter is None or i < n_iter:
+            if vocab_size is not None and len(vocab) >= vocab_size:
+                reason = 'vocab_size'
+                break
+
+            if track:
+                tick = clock()
+            if trainer is None:
+                pairs = self.get_stats(self.corpus)
+                best = max(pairs, key=pairs.get) if pairs else None
+                freq = pairs[best] if pairs else 0
+            else:
+                best = trainer.best_pair()
+                freq = trainer.pair_counts[best] if best is not None else 0
+            if best is None:
+                reason = 'exhausted'
+                break
+            if freq < min_frequency:
+                reason = 'min_frequency'
+                if trainer is not None:
+                    best = trainer.symbol_pair(best)
+                break
+            if pending is not None:
+                paused = clock()
+                callback(pending)
+                pending = None
+                tick += clock() - paused
+
+            if track:
+                tock = clock()
+                stats_sec += tock - tick
+            if trainer is None:
+                self.corpus = self.merge_vocab(best, self.corpus)
+            else:
+                trainer.merge(best)
+                best = trainer.symbol_pair(best)
+            self.record[best] = start + i
+            if vocab is not None:
+                vocab.setdefault(best[0] + best[1], len(vocab))
+            i += 1
+
+            if track:
+                merge_sec += clock() - tock
+                if i % report_every == 0:
+                    last_report, pending = progress(i, reported)
+                    reported = i
+
+            if trainer is not None and recount_every is not None and i % recount_every == 0:
+                if track:
+                    tick = clock()
+                trainer.rebuild()
+                if track:
+                    stats_sec += clock() - tick
+
+            if checkpoint_path is not None:
+                due = checkpoint_every is not None and i % checkpoint_every == 0
+                if not due and checkpoint_interval is not None:
+                    due = time.monotonic() - last_checkpoint >= checkpoint_interval
+                if due:
+                    self._save_checkpoint(checkpoint_path, trainer, start)
+                    last_checkpoint = time.monotonic()
+
+        if trainer is not None:
+            self.corpus = trainer.get_corpus()
+        if checkpoint_path is not None:
+            self._save_checkpoint(checkpoint_path, None, start)
+        if track:
+            final = progress(i, reported, reason)[1]
+            if pending is not None:
+                final['merges_per_sec'] = pending['merges_per_sec']
+            callback(final)
+        self.stop_reason = reason
+        return reason
+
+    # 학습 체크포인트 저장. 엔진을 쓰는 중이면 엔진이 들고 있는 코퍼스 상태를 꺼내서 저장한다.
+    def _save_checkpoint(self, path: str, trainer, start: int) -> None:
+        corpus = trainer.get_corpus() if trainer is not None else self.corpus
+        save_checkpoint(path, {'record': self.record, 'corpus': corpus, 'start': start, 'byte_level': self.byte_level})
     
     # 새로운 텍스트 인풋을 받아서 페어 반환.   
     def get_pairs(self, text: Union[List[str], str]) -> List[Tuple[str, str]]:
@@ -69,62 +371,254 @@ class BPETokenizer(Tokenizer):
             prev_char = char
         return pairs
     
+    # 병합 전 단어의 심볼들. 글자 단위면 글자들 뒤에 </w>, 바이트 단위면 UTF-8 바이트 심볼들.
+    def _symbols(self, word: str) -> List[str]:
+        if self.byte_level:
+            return list(to_byte_symbols(word))
+        return list(word) + ["</w>"]
+
+    # 코퍼스 키('l o w </w>')를 원래 단어로 되돌린다.
+    def _word_from_key(self, key: str) -> str:
+        if self.byte_level:
+            return from_byte_symbols(key.replace(' ', ''))
+        return key[:-len(" </w>")].replace(' ', '')
+
+    # 한 단어에 대한 BPE 병합. 심볼들을 연결 리스트로 두고, 병합 가능한 페어를 (순위, 위치) 우선순위 큐로 관리한다.
+    # 순위가 가장 낮은 페어부터 왼쪽에서 오른쪽으로 병합하므로 매 단계 페어 집합을 다시 만들 필요가 없다.
+    def _bpe_word(self, word: str, trace: Optional[Callable[[str], None]] = None) -> Tuple[str, ...]:
+        symbols = self._symbols(word)
+        n = len(symbols)
+        prev = list(range(-1, n - 1))
+        nxt = list(range(1, n + 1))
+        nxt[-1] = -1
+
+        record = self.record
+        heap = []
+        for i in range(n - 1):
+            rank = record.get((symbols[i], symbols[i+1]))
+            if rank is not None:
+                heap.append((rank, i))
+        heapq.heapify(heap)
+
+        while heap:
+            rank, i = heapq.heappop(heap)
+            j = nxt[i]
+            if symbols[i] is None or j == -1:
+                continue
+            pair = (symbols[i], symbols[j])
+            if record.get(pair) != rank:
+                continue
+
+            symbols[i] = pair[0] + pair[1]
+            symbols[j] = None
+            nxt[i] = nxt[j]
+            if nxt[j] != -1:
+                prev[nxt[j]] = i
+
+            if trace is not None:
+                trace("merge {} (rank {}) -> {}".format(pair, rank, [s for s in symbols if s is not None]))
+
+            if prev[i] != -1:
+                rank = record.get((symbols[prev[i]], symbols[i]))
+                if rank is not None:
+                    heapq.heappush(heap, (rank, prev[i]))
+            if nxt[i] != -1:
+                rank = record.get((symbols[i], symbols[nxt[i]]))
+                if rank is not None:
+                    heapq.heappush(heap, (rank, i))
+
+        return tuple(s for s in symbols if s is not None)
+
+    # 새 단어들에 record의 병합을 순서대로 다시 적용. 순위가 낮은 페어부터 병합하는 _bpe_word와 결과가 같다.
+    def _apply_record(self, corpus: Dict[str, int]) -> Dict[str, int]:
+        merged = {}
+        for word, freq in corpus.items():
+            key = ' '.join(self._tokenize_word(self._word_from_key(word)))
+            merged[key] = merged.get(key, 0) + freq
+        return merged
+
+    # 캐시를 거쳐 단어를 토크나이즈. 자주 나오는 단어는 병합을 다시 계산하지 않는다.
+    def _tokenize_word(self, word: str, trace: Optional[Callable[[str], None]] = None) -> Tuple[str, ...]:
+        tokens = self.cache.get(word)
+        if tokens is not None:
+            if trace is not None:
+                trace("cache hit: {}".format(word))
+            return tokens
+
+        tokens = self._bpe_word(word, trace)
+        self.cache.put(word, tokens)
+        return tokens
+
+    # vocab이 바뀌면 단어 -> 토큰 ID 캐시는 더 이상 맞지 않으므로 비운다.
+    def _set_vocab(self, tokens: Iterable[str]) -> Dict[str, int]:
+        self.id_cache.clear()
+        return super()._set_vocab(tokens)
+
+    # 두 캐시의 hits, misses, hit_rate, entries, bytes.
+    def cache_stats(self) -> Dict[str, dict]:
+        return {'tokens': self.cache.stats(), 'ids': self.id_cache.stats()}
+
     # 코퍼스로 학습한 내용을 바탕으로 새로운 인풋에 대한 토크나이즈.
-    def tokenize(self, text: Union[List[str], str]) -> List[Tuple[str, int]]:
-        
-        text = list(text) + ["</w>"]
-        pairs = self.get_pairs(text)
-        iteration = 0
-            
-        while True:
-            print("----------------------------------------------------------------------------")
-            iteration += 1
-            print("iteration            : {}".format(iteration))
-            print("pairs in the text    : {}".format(pairs))
-            candidate = min(pairs, key = lambda pair: self.record.get(pair, float('inf')))
-            print("candidate for merging: {}".format(candidate))
-                
-            if candidate not in self.record:
-                print("Candidate not in BPE merges, algorithm stops.")
-                break
-                
-            first, second = candidate
-            new_text = []
-            i = 0
-            while i < len(text):
-                try:
-                    j = text.index(first, i)
-                    new_text.extend(text[i:j])
-                    i = j
-                except:
-                    new_text.extend(text[i:])
-                    break
-
-                if text[i] == first and i < len(text)-1 and text[i+1] == second:
-                    new_text.append(first+second)
-                    i += 2
-                else:
-                    new_text.append(text[i])
-                    i += 1
-            text = new_text
-                
-            print("text after merging: {}".format(text))
-                
-            if len(text) == 1:
-                break
+    # 텍스트는 학습 코퍼스와 같은 방식으로 단어 단위로 나눈 뒤 단어별로 병합한다.
+    # trace에 print 같은 함수를 넘기면 병합 과정을 한 줄씩 받아볼 수 있다.
+    def tokenize(self, text: Union[List[str], str],
+                 trace: Optional[Callable[[str], None]] = None) -> List[str]:
+        if not isinstance(text, str):
+            text = ' '.join(text)
+
+        tokens = []
+        for word in self.pre_tokenizer(text):
+            tokens.extend(self._tokenize_word(word, trace))
+        return tokens
+
+    # 토큰 -> ID 사전. 처음 만들 때는 특수 토큰, 코퍼스의 기본 문자와 </w>, 병합 순서대로의 병합 심볼 순으로 ID를 붙인다.
+    # 바이트 단위면 기본 심볼은 코퍼스와 상관없이 바이트 순서대로의 256개다.
+    # 이미 vocab이 있으면(train, add_corpus 이후나 load한 모델) 기존 토큰의 ID는 그대로 두고
+    # 새 기본 문자와 새 병합 심볼만 뒤에 붙인다. 그래서 저장한 모델과 만들어 둔 샤드의 ID가 계속 맞는다.
+    def _build_vocab(self) -> Dict[str, int]:
+        merged = [first + second for first, second in sorted(self.record, key=self.record.get)]
+        if self.byte_level:
+            return self._set_vocab(self.id_to_token + [PAD_TOKEN, UNK_TOKEN] + BYTE_SYMBOLS + merged)
+
+        chars = set()
+        for word in self.corpus:
+            chars.update(word.replace(' ', '')[:-len("</w>")])
+        for first, second in self.record:
+            chars.update(first.replace("</w>", ''))
+            chars.update(second.replace("</w>", ''))
+
+        return self._set_vocab(self.id_to_token + [PAD_TOKEN, UNK_TOKEN] + sorted(chars) + ["</w>"] + merged)
+
+    # 여러 문서를 한 번에 토큰 ID로 인코딩.
+    # 배치 전체에서 고유 단어만 뽑아 ID 캐시에 없는 단어만 한 번씩 인코딩하고, 그런 단어가 많으면 프로세스 풀로 나눠서 처리한다.
+    # 병합 테이블은 워커를 띄울 때 initializer로 한 번만 보낸다.
+    # max_length, padding, return_type은 Tokenizer._finish_batch 참고.
+    def encode_batch(self, texts: Union[List[str], str], num_workers: Optional[int] = None,
+                     padding: bool = False, max_length: Optional[int] = None,
+                     return_type: str = 'array'):
+        if isinstance(texts, str):
+            texts = [texts]
+        vocab = self.get_vocab()
+        unk_id = vocab[UNK_TOKEN]
+
+        docs = [self.pre_tokenizer(text) for text in texts]
+        unique = dict.fromkeys(word for words in docs for word in words)
+
+        word_ids = {}
+        todo = []
+        for word in unique:
+            ids = self.id_cache.get(word)
+            if ids is None:
+                todo.append(word)
             else:
-                pairs = self.get_pairs(text)
-                print(text)
-                print(pairs)
-                    
-        return text
+                word_ids[word] = ids
 
-        
+        word_tokens = {}
+        if num_workers and num_workers > 1 and len(todo) >= PARALLEL_MIN_WORDS:
+            chunk_size = -(-len(todo) // (num_workers * 4))
+            chunks = [todo[i:i + chunk_size] for i in range(0, len(todo), chunk_size)]
+            with ProcessPoolExecutor(max_workers=num_workers, initializer=_init_encode_worker,
+                                     initargs=(self.record, self.byte_level)) as executor:
+                for chunk, results in zip(chunks, executor.map(_encode_words, chunks)):
+                    word_tokens.update(zip(chunk, results))
+        else:
+            for word in todo:
+                word_tokens[word] = self._tokenize_word(word)
+
+        for word, tokens in word_tokens.items():
+            ids = array('I', [vocab.get(token, unk_id) for token in tokens])
+            self.id_cache.put(word, ids)
+            word_ids[word] = ids
+
+        batch = []
+        for words in docs:
+            ids = array('I')
+            for word in words:
+                ids.extend(word_ids[word])
+            batch.append(ids)
+
+        return self._finish_batch(batch, padding, max_length, return_type)
+
+    # 문서들을 순서대로 인코딩해서 문서마다 array('I')를 하나씩 내준다. 입력은 제너레이터여도 된다.
+    # num_workers가 2 이상이면 chunk_size개씩 묶어서 프로세스 풀에서 인코딩하고, 한 번에 num_workers * 2 묶음까지만
+    # 풀에 올려서 입력을 전부 읽어 들이지 않는다. 워커는 병합 테이블과 vocab을 initializer로 한 번만 받는다.
+    def encode_stream(self, texts: Iterable[str], num_workers: Optional[int] = None,
+                      chunk_size: int = 256) -> Iterator[array]:
+        self.get_vocab()
+        texts = iter(texts)
+        chunks = iter(lambda: list(islice(texts, chunk_size)), [])
+        if not num_workers or num_workers < 2:
+            for chunk in chunks:
+                yield from self.encode_batch(chunk, return_type='array')
+            return
+
+        pending = collections.deque()
+        with ProcessPoolExecutor(max_workers=num_workers, initializer=_init_encode_worker,
+                                 initargs=(self.record, self.byte_level, self.pre_tokenizer,
+                                           self.id_to_token)) as executor:
+            for chunk in chunks:
+                pending.append(executor.submit(_encode_docs, chunk))
+                if len(pending) >= num_workers * 2:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+
+    # 토큰 ID를 다시 텍스트로. </w>는 단어 사이 공백으로 바꾸고 <pad>는 건너뛴다.
+    # 바이트 단위면 토큰들을 이어 붙인 바이트를 UTF-8로 풀기만 하면 원래 텍스트가 된다.
+    def decode(self, ids: Iterable[int]) -> str:
+        self.get_vocab()
+        id_to_token = self.id_to_token
+        pad_id = self.vocab[PAD_TOKEN]
+        text = ''.join(id_to_token[i] for i in ids if i != pad_id)
+        if self.byte_level:
+            return from_byte_symbols(text)
+        return text.replace("</w>", ' ').strip()
+
+    # 학습한 병합을 바이너리 파일로 저장. 심볼 테이블은 vocab의 ID 순서를 그대로 쓰고, 병합은 ID 페어로 저장한다.
+    def save(self, path: str) -> None:
+        vocab = self.get_vocab()
+        symbols = list(vocab)
+        merges = [(vocab[first], vocab[second]) for first, second in sorted(self.record, key=self.record.get)]
+        save_model(path, symbols, merges, FLAG_BYTE_LEVEL if self.byte_level else 0)
+
+    # save로 저장한 모델을 불러온다. 병합 테이블은 파일을 mmap한 MergeTable이라
+    # 여러 프로세스가 같은 파일을 불러와도 메모리를 따로 쓰지 않는다.
+    @classmethod
+    def load(cls, path: str, cache_size: int = 100000,
+             pre_tokenizer: Optional[Callable[[str], List[str]]] = None,
+             cache_bytes: Optional[int] = None) -> "BPETokenizer":
+        record = MergeTable(path)
+        tokenizer = cls(cache_size=cache_size, pre_tokenizer=pre_tokenizer,
+                        byte_level=bool(record.flags & FLAG_BYTE_LEVEL), cache_bytes=cache_bytes)
+        tokenizer.record = record
+        symbols = list(record.symbols)
+        if symbols[:2] == LEGACY_SPECIAL_TOKENS:
+            symbols[:2] = [PAD_TOKEN, UNK_TOKEN]
+        tokenizer._set_vocab(symbols)
+        return tokenizer
+
+
+# 프로세스 풀 워커마다 병합 테이블을 한 번만 받아 두는 토크나이저.
+_worker_tokenizer = None
+
+
+# tokens를 주면 메인 프로세스와 같은 ID를 쓰도록 vocab도 그대로 맞춘다(문서 단위 인코딩용).
+def _init_encode_worker(record, byte_level, pre_tokenizer=None, tokens=None):
+    global _worker_tokenizer
+    _worker_tokenizer = BPETokenizer(byte_level=byte_level, pre_tokenizer=pre_tokenizer)
+    _worker_tokenizer.record = record
+    if tokens is not None:
+        _worker_tokenizer._set_vocab(tokens)
+
+
+def _encode_words(words):
+    return [_worker_tokenizer._bpe_word(word) for word in words]
+
+
+def _encode_docs(texts):
+    return _worker_tokenizer.encode_batch(texts, return_type='array')
 
 
-        
-        
-        
 """
 vocab = {
 'l o w </w>': 5,
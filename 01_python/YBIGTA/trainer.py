@@ -0,0 +1,253 @@
+import heapq
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# 매 반복마다 코퍼스 전체를 다시 훑지 않는 증분형 BPE 학습 엔진.
+# 페어 빈도 테이블은 처음에 한 번만 만들고, 병합 후에는 병합된 페어를 가진 단어들만 갱신한다.
+#
+# get_stats + max 조합과 정확히 같은 병합 순서를 내기 위해, 빈도가 같은 페어끼리는
+# 코퍼스를 순서대로 훑었을 때 먼저 등장하는 페어(단어 순서, 단어 내 글자 위치)를 고른다.
+# 글자 위치(offset)는 병합이 일어나도 변하지 않으므로 힙의 정렬 키로 그대로 쓸 수 있다.
+class BPETrainer:
+    def __init__(self, corpus: Dict[str, int]):
+        self.words = [self._encode_word(word) for word in corpus]
+        self.freqs: List[int] = list(corpus.values())
+        self.rebuild()
+
+    # 페어 빈도 테이블, 역색인, 힙을 현재 단어들로부터 처음부터 다시 만든다.
+    # 학습 중간에 다시 부르면 lazy invalidation으로 쌓인 오래된 힙 원소도 정리된다.
+    def rebuild(self) -> None:
+        # 페어 -> 빈도, 페어 -> 그 페어를 가진 단어 인덱스 집합(역색인),
+        # 페어가 처음 등장하는 단어 인덱스의 하한. 실제 값은 힙에서 꺼낼 때 확인한다.
+        self.pair_counts, self.where, self.first = self._count_all()
+
+        # 힙 원소: (-빈도, 첫 단어 인덱스, 단어 내 글자 위치, 페어)
+        # 힙에 있는 키는 항상 실제 키보다 작거나 같도록 유지하고, 꺼낼 때 검증한다(lazy invalidation).
+        self.heap = [(-count, self.first[pair], -1, pair) for pair, count in self.pair_counts.items()]
+        heapq.heapify(self.heap)
+
+    # 코퍼스 전체를 훑어서 (페어 빈도, 역색인, 첫 등장 단어 인덱스)를 센다.
+    def _count_all(self) -> Tuple[Dict[tuple, int], Dict[tuple, set], Dict[tuple, int]]:
+        pair_counts, where, first = {}, {}, {}
+        for idx, symbols in enumerate(self.words):
+            freq = self.freqs[idx]
+            for pair in zip(symbols, symbols[1:]):
+                pair_counts[pair] = pair_counts.get(pair, 0) + freq
+                if pair not in where:
+                    where[pair] = set()
+                    first[pair] = idx
+                where[pair].add(idx)
+        return pair_counts, where, first
+
+    # 단어 문자열('l o w </w>')을 내부 심볼 시퀀스로 변환.
+    def _encode_word(self, word: str) -> List[str]:
+        return word.split()
+
+    def _symbol_length(self, symbol: str) -> int:
+        return len(symbol)
+
+    def _merged_symbol(self, first: str, second: str) -> str:
+        return first + second
+
+    # 단어 안의 (first, second)를 왼쪽부터 겹치지 않게 merged로 바꾼다.
+    def _rewrite(self, idx: int, first, second, merged) -> None:
+        symbols = self.words[idx]
+        new_symbols = []
+        i = 0
+        while i < len(symbols):
+            if i < len(symbols) - 1 and symbols[i] == first and symbols[i+1] == second:
+                new_symbols.append(merged)
+                i += 2
+            else:
+                new_symbols.append(symbols[i])
+                i += 1
+        self.words[idx] = new_symbols
+
+    # 내부 심볼 페어를 문자열 페어로 변환.
+    def symbol_pair(self, pair) -> Tuple[str, str]:
+        return pair
+
+    # 단어 안에서 페어가 처음 등장하는 글자 위치.
+    def _offset(self, symbols, pair) -> int:
+        offset = 0
+        for i in range(len(symbols) - 1):
+            if symbols[i] == pair[0] and symbols[i+1] == pair[1]:
+                return offset
+            offset += self._symbol_length(symbols[i])
+        return -1
+
+    # 페어가 코퍼스에서 처음 등장하는 (단어 인덱스, 글자 위치).
+    def _first_occurrence(self, pair) -> Tuple[int, int]:
+        idx = self.first[pair]
+        if idx not in self.where[pair]:
+            idx = min(self.where[pair])
+            self.first[pair] = idx
+        return idx, self._offset(self.words[idx], pair)
+
+    # 현재 코퍼스에서 가장 빈도 수가 높은 페어. 더 병합할 페어가 없으면 None.
+    def best_pair(self) -> Optional[tuple]:
+        while self.heap:
+            neg_count, idx, offset, pair = self.heap[0]
+            count = self.pair_counts.get(pair, 0)
+            if count <= 0:
+                heapq.heappop(self.heap)
+                continue
+            if -neg_count != count:
+                heapq.heapreplace(self.heap, (-count, self.first[pair], -1, pair))
+                continue
+            true_idx, true_offset = self._first_occurrence(pair)
+            if (idx, offset) != (true_idx, true_offset):
+                heapq.heapreplace(self.heap, (-count, true_idx, true_offset, pair))
+                continue
+            return pair
+        return None
+
+    # 페어 병합. 병합된 페어를 가진 단어들만 다시 쓰고, 페어 빈도와 역색인을 갱신한다.
+    def merge(self, pair) -> None:
+        first, second = pair
+        merged = self._merged_symbol(first, second)
+        touched = set()
+
+        for idx in self.where.pop(pair, ()):
+            freq = self.freqs[idx]
+            old_pairs = self._count_pairs(self.words[idx])
+            self._rewrite(idx, first, second, merged)
+            new_pairs = self._count_pairs(self.words[idx])
+
+            for p, c in old_pairs.items():
+                diff = new_pairs.get(p, 0) - c
+                if diff:
+                    self.pair_counts[p] += diff * freq
+                if p not in new_pairs and p != pair:
+                    self.where[p].discard(idx)
+            for p, c in new_pairs.items():
+                if p not in old_pairs:
+                    self.pair_counts[p] = self.pair_counts.get(p, 0) + c * freq
+                    if p not in self.where:
+                        self.where[p] = set()
+                        self.first[p] = idx
+                    self.where[p].add(idx)
+                # 병합으로 새로 생긴 자리의 페어는 더 앞쪽에 등장할 수 있으므로 힙에 다시 넣는다.
+                if merged in p:
+                    self.first[p] = min(self.first[p], idx)
+                    touched.add(p)
+
+        self.pair_counts.pop(pair, None)
+        for p in touched:
+            heapq.heappush(self.heap, (-self.pair_counts[p], self.first[p], -1, p))
+
+    def _count_pairs(self, symbols) -> Dict[tuple, int]:
+        pairs = {}
+        for p in zip(symbols, symbols[1:]):
+            pairs[p] = pairs.get(p, 0) + 1
+        return pairs
+
+    # 학습 결과를 기존 코퍼스와 같은 형태('l o w</w>': 빈도)로 되돌린다.
+    def get_corpus(self) -> Dict[str, int]:
+        return {' '.join(symbols): freq for symbols, freq in zip(self.words, self.freqs)}
+
+
+# 단어를 공백으로 이어 붙인 문자열 대신 정수 심볼 ID 배열(array('I'))로 저장하는 학습 엔진.
+# 심볼 문자열은 한 번만 인터닝하고, 병합은 해당 단어의 배열을 제자리에서 다시 쓴다.
+# alphabet을 주면 그 심볼들을 먼저 순서대로 인터닝한다. 바이트 단위 BPE에서는 바이트 b의 ID가 b가 된다.
+# stats='numpy'면 처음 페어를 셀 때와 rebuild 때 파이썬 루프 대신 numpy로 한꺼번에 센다(numpy 필요).
+class ArrayBPETrainer(BPETrainer):
+    def __init__(self, corpus: Dict[str, int], alphabet: Iterable[str] = (), stats: str = 'dict'):
+        if stats not in ('dict', 'numpy'):
+            raise ValueError("Unknown stats backend: {}".format(stats))
+        if stats == 'numpy' and np is None:
+            raise ImportError("stats='numpy' requires numpy")
+        self.stats = stats
+        self.symbols: List[str] = []
+        self.symbol_ids: Dict[str, int] = {}
+        self.lengths: List[int] = []
+        for symbol in alphabet:
+            self._intern(symbol)
+        super().__init__(corpus)
+
+    # 심볼 문자열을 정수 ID로 인터닝.
+    def _intern(self, symbol: str) -> int:
+        sid = self.symbol_ids.get(symbol)
+        if sid is None:
+            sid = len(self.symbols)
+            self.symbol_ids[symbol] = sid
+            self.symbols.append(symbol)
+            self.lengths.append(len(symbol))
+        return sid
+
+    def _encode_word(self, word: str) -> array:
+        return array('I', [self._intern(symbol) for symbol in word.split()])
+
+    def _symbol_length(self, symbol: int) -> int:
+        return self.lengths[symbol]
+
+    def _merged_symbol(self, first: int, second: int) -> int:
+        return self._intern(self.symbols[first] + self.symbols[second])
+
+    def _rewrite(self, idx: int, first: int, second: int, merged: int) -> None:
+        symbols = self.words[idx]
+        n = len(symbols)
+        i = j = 0
+        while i < n:
+            if i < n - 1 and symbols[i] == first and symbols[i+1] == second:
+                symbols[j] = merged
+                i += 2
+            else:
+                symbols[j] = symbols[i]
+                i += 1
+            j += 1
+        del symbols[j:]
+
+    # 모든 단어를 이어 붙인 심볼 배열에서 단어 경계를 넘지 않는 인접 위치마다 (왼쪽 * V + 오른쪽) 키를 만들고,
+    # 키로 정렬한 뒤 같은 키 구간별로 빈도를 더한다. 안정 정렬이라 구간 안의 단어 인덱스는 오름차순이다.
+    def _count_all(self) -> Tuple[Dict[tuple, int], Dict[tuple, set], Dict[tuple, int]]:
+        if self.stats == 'dict':
+            return super()._count_all()
+
+        lengths = np.fromiter(map(len, self.words), dtype=np.int64, count=len(self.words))
+        flat = np.frombuffer(b''.join(self.words), dtype=np.uintc).astype(np.int64)
+        if len(flat) == 0:
+            return {}, {}, {}
+
+        # 각 위치가 속한 단어. 단어의 마지막 심볼은 오른쪽 짝이 없으므로 뺀다.
+        owner = np.repeat(np.arange(len(self.words), dtype=np.int64), lengths)
+        is_left = np.ones(len(flat), dtype=bool)
+        ends = np.cumsum(lengths)
+        is_left[ends[lengths > 0] - 1] = False
+        pos = np.flatnonzero(is_left)
+        # 모든 단어가 심볼 하나짜리면 셀 쌍이 없다(reduceat은 빈 배열을 받지 못한다).
+        if len(pos) == 0:
+            return {}, {}, {}
+
+        n_symbols = len(self.symbols)
+        keys = flat[pos] * n_symbols + flat[pos + 1]
+        word_idx = owner[pos]
+        weights = np.asarray(self.freqs, dtype=np.int64)[word_idx]
+
+        order = np.argsort(keys, kind='stable')
+        keys = keys[order]
+        word_idx = word_idx[order]
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        counts = np.add.reduceat(weights[order], starts)
+        unique_keys = keys[starts]
+
+        pairs = list(zip((unique_keys // n_symbols).tolist(), (unique_keys % n_symbols).tolist()))
+        pair_counts = dict(zip(pairs, counts.tolist()))
+        first = dict(zip(pairs, word_idx[starts].tolist()))
+        bounds = starts.tolist() + [len(keys)]
+        word_idx = word_idx.tolist()
+        where = {pair: set(word_idx[bounds[g]:bounds[g+1]]) for g, pair in enumerate(pairs)}
+        return pair_counts, where, first
+
+    def symbol_pair(self, pair: Tuple[int, int]) -> Tuple[str, str]:
+        return self.symbols[pair[0]], self.symbols[pair[1]]
+
+    def get_corpus(self) -> Dict[str, int]:
+        symbols = self.symbols
+        return {' '.join([symbols[s] for s in word]): freq for word, freq in zip(self.words, self.freqs)}
@@ -0,0 +1,163 @@
+import argparse
+import json
+import os, platform, random, sys, time
+from itertools import accumulate
+from typing import Iterator, List, Optional
+
+from YBIGTA.preprocessor import TextPreprocessor
+from YBIGTA.tokenizers import BPETokenizer, WordTokenizer
+from YBIGTA.trainer import ArrayBPETrainer
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+# 시드가 같으면 항상 같은 코퍼스를 만든다. 단어 빈도는 순위의 -s 제곱에 비례하는 지프 분포를 따른다.
+def synthetic_corpus(
+    n_docs: int = 1000,
+    vocab_size: int = 20000,
+    words_per_doc: int = 400,
+    zipf_s: float = 1.1,
+    seed: int = 0
+) -> List[str]:
+    rng = random.Random(seed)
+    letters = "etaoinshrdlcumwfgypbvkjxqz"
+    letter_weights = list(accumulate(1 / (i + 1) for i in range(len(letters))))
+
+    words = set()
+    while len(words) < vocab_size:
+        length = min(1 + int(rng.expovariate(1 / 5)), 20)
+        words.add("".join(rng.choices(letters, cum_weights=letter_weights, k=length)))
+    words = sorted(words)
+    rng.shuffle(words)
+
+    cum_weights = list(accumulate(1 / (rank + 1) ** zipf_s for rank in range(vocab_size)))
+    return [" ".join(rng.choices(words, cum_weights=cum_weights, k=words_per_doc)) for _ in range(n_docs)]
+
+
+# 디렉토리 안의 파일들을 이름 순으로 하나씩 읽는다.
+def read_dir(path: str, n: Optional[int] = None) -> Iterator[str]:
+    for name in sorted(os.listdir(path))[:n]:
+        with open(os.path.join(path, name), encoding="utf-8", errors="replace") as f:
+            yield f.read()
+
+
+# 프로세스의 최대 메모리 사용량(MB). 리눅스는 KB, macOS는 바이트 단위로 돌려준다.
+def peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def run(args) -> dict:
+    if args.data_dir:
+        texts = list(read_dir(args.data_dir, args.n_docs))
+    else:
+        texts = synthetic_corpus(args.n_docs, args.vocab_size, args.words_per_doc, args.zipf_s, args.seed)
+    n_words = sum(len(text.split()) for text in texts)
+    results = {"n_docs": len(texts), "n_words": n_words}
+
+    processor, sec = timed(TextPreprocessor, texts, num_workers=args.num_workers)
+    results["preprocess"] = {"sec": sec, "unique_words": len(processor.get_corpus())}
+
+    # 학습 전 첫 페어 빈도 계산만 따로 잰다. dict 버전과 numpy 버전을 같은 코퍼스에서 비교하는 용도.
+    if args.tokenizer == "bpe" and args.stats_compare:
+        results["pair_stats"] = {}
+        for stats in ("dict", "numpy"):
+            trainer, sec = timed(ArrayBPETrainer, processor.get_corpus(), stats=stats)
+            results["pair_stats"][stats] = {"sec": sec, "pairs": len(trainer.pair_counts)}
+            del trainer
+
+    if args.tokenizer == "word":
+        tokenizer = WordTokenizer(texts, num_workers=args.num_workers)
+        _, sec = timed(tokenizer.train)
+        results["train"] = {"sec": sec, "vocab_size": len(tokenizer.get_vocab())}
+    else:
+        tokenizer = BPETokenizer(texts, num_workers=args.num_workers)
+        blocks = []
+        reason, sec = timed(tokenizer.train, args.n_merges, engine=args.engine,
+                            callback=blocks.append, report_every=args.merge_step,
+                            stats=args.stats, recount_every=args.recount_every)
+        for block in blocks:
+            block["best_pair"] = list(block["best_pair"]) if block["best_pair"] else None
+        results["train"] = {
+            "engine": args.engine,
+            "stats": args.stats,
+            "blocks": blocks,
+            "sec": sec,
+            "merges": len(tokenizer.record),
+            "merges_per_sec": len(tokenizer.record) / sec if sec else None,
+            "stop_reason": reason,
+        }
+
+    eval_texts = texts[:args.n_eval]
+    n_eval_words = sum(len(text.split()) for text in eval_texts)
+    if args.tokenizer == "bpe":
+        tokens, sec = timed(lambda: [tokenizer.tokenize(text) for text in eval_texts])
+        n_tokens = sum(map(len, tokens))
+        results["tokenize"] = {"sec": sec, "tokens": n_tokens, "tokens_per_sec": n_tokens / sec if sec else None}
+        tokenizer.cache.clear()
+
+    for phase in ("encode_batch", "encode_batch_warm"):
+        batch, sec = timed(tokenizer.encode_batch, eval_texts, num_workers=args.num_workers, return_type="array")
+        n_tokens = sum(map(len, batch))
+        results[phase] = {
+            "sec": sec,
+            "tokens": n_tokens,
+            "tokens_per_sec": n_tokens / sec if sec else None,
+            "words_per_sec": n_eval_words / sec if sec else None,
+        }
+        if args.tokenizer == "word":
+            break
+    if args.tokenizer == "bpe":
+        results["cache"] = tokenizer.cache_stats()
+
+    results["peak_rss_mb"] = peak_rss_mb()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark tokenizer preprocessing, training and encoding.")
+    parser.add_argument("-d", "--data_dir", type=str, default=None,
+                        help="read documents from this directory instead of generating a synthetic corpus")
+    parser.add_argument("-c", "--n_docs", type=int, default=1000)
+    parser.add_argument("--vocab_size", type=int, default=20000, help="unique words in the synthetic corpus")
+    parser.add_argument("--words_per_doc", type=int, default=400)
+    parser.add_argument("--zipf_s", type=float, default=1.1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-k", "--tokenizer", choices=["bpe", "word"], default="bpe")
+    parser.add_argument("-e", "--engine", choices=["incremental", "array", "naive"], default="incremental")
+    parser.add_argument("-i", "--n_merges", type=int, default=2000)
+    parser.add_argument("--stats", choices=["dict", "numpy"], default="dict",
+                        help="pair counting backend for the array engine")
+    parser.add_argument("--recount_every", type=int, default=None, help="rebuild pair statistics every N merges")
+    parser.add_argument("--stats_compare", action="store_true",
+                        help="time the initial pair count with both the dict and the numpy backend")
+    parser.add_argument("--merge_step", type=int, default=500, help="report training time every N merges")
+    parser.add_argument("--n_eval", type=int, default=200, help="documents used for tokenize/encode timing")
+    parser.add_argument("-w", "--num_workers", type=int, default=None)
+    parser.add_argument("-o", "--output", type=str, default=None, help="write the JSON report here")
+    args = parser.parse_args()
+
+    report = {
+        "config": vars(args),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": run(args),
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
@@ -1,48 +1,205 @@
 import argparse
 import os, tarfile
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 from urllib.request import urlretrieve
-from typing import Optional
+from typing import Iterable, Iterator, Optional
 
+from YBIGTA.preprocessor import PreTokenizer
+from YBIGTA.serialization import DOCS_COMPLETE, ShardWriter, document_info, load_documents, save_documents
 from YBIGTA.tokenizers import BPETokenizer, WordTokenizer
 
+
+def read_text(path: str) -> str:
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+# 기사 파일들을 이름 순으로 n개까지 읽는다. 파일 읽기는 num_threads개 스레드에서 동시에 하지만,
+# 결과는 항상 파일 이름 순서다. archive_path를 주면 읽은 문서들을 아카이브 파일 하나로 저장해 두고,
+# 다음 실행부터는 아카이브에 문서가 충분하면 파일들 대신 아카이브를 한 번에 순서대로 읽는다.
 def load_corpus(
     url: str = "https://huggingface.co/datasets/cnn_dailymail/resolve/2d2c6100ccd17c0b215f85c38e36c4e7a5746425/data/cnn_stories.tgz",
     dl_name: str = "dataset.tgz",
     text_dir: str = "cnn/stories/",
-    n: Optional[int] = None
+    n: Optional[int] = None,
+    num_threads: int = 16,
+    archive_path: Optional[str] = None
 ) -> list[str]:
+    if archive_path is not None and os.path.exists(archive_path):
+        n_docs, flags = document_info(archive_path)
+        if flags & DOCS_COMPLETE or (n is not None and n <= n_docs):
+            return load_documents(archive_path, n)
+
     if not os.path.exists(text_dir):
         if not os.path.exists(dl_name):
             urlretrieve(url, dl_name)
-        tarfile.open(dl_name).extractall()
+        with tarfile.open(dl_name) as tar:
+            tar.extractall()
 
-    ls = os.listdir(text_dir)[:n]
-    dir_to_text = lambda f: open(text_dir + f).read()
-    dataset = [*map(dir_to_text, ls)]
+    names = sorted(os.listdir(text_dir))
+    paths = [os.path.join(text_dir, name) for name in names[:n]]
+    with ThreadPoolExecutor(max_workers=num_threads) as executor:
+        dataset = list(executor.map(read_text, paths))
+
+    if archive_path is not None:
+        save_documents(archive_path, dataset, DOCS_COMPLETE if len(paths) == len(names) else 0)
     return dataset
 
 
+# 압축을 디스크에 풀지 않고 .tgz 안의 기사들을 하나씩 읽어서 내보낸다.
+def stream_corpus(
+    url: str = "https://huggingface.co/datasets/cnn_dailymail/resolve/2d2c6100ccd17c0b215f85c38e36c4e7a5746425/data/cnn_stories.tgz",
+    dl_name: str = "dataset.tgz",
+    n: Optional[int] = None
+) -> Iterator[str]:
+    if not os.path.exists(dl_name):
+        urlretrieve(url, dl_name)
+
+    count = 0
+    with tarfile.open(dl_name, "r|gz") as tar:
+        for member in tar:
+            if n is not None and count >= n:
+                break
+            if not member.isfile():
+                continue
+            with tar.extractfile(member) as f:
+                yield f.read().decode("utf-8")
+            count += 1
+
+
+# 문서들을 인코딩해서 prefix로 시작하는 토큰 샤드 파일들(.bin, .idx)로 쓴다.
+# 문서는 스트리밍으로 읽고 프로세스 풀에서 인코딩하며, 출력은 고정 크기 버퍼를 거쳐 파일에 쓴다.
+def write_shards(
+    tokenizer: BPETokenizer,
+    texts: Iterable[str],
+    prefix: str,
+    num_workers: Optional[int] = None,
+    shard_tokens: int = 1 << 28,
+    buffer_tokens: int = 1 << 20
+) -> ShardWriter:
+    with ShardWriter(prefix, len(tokenizer.get_vocab()), shard_tokens, buffer_tokens) as writer:
+        for ids in tokenizer.encode_stream(texts, num_workers=num_workers):
+            writer.add(ids)
+    return writer
+
+
+# 학습 진행 상황을 한 줄로 출력.
+def print_progress(metrics: dict) -> None:
+    print("merges {merges:>7} | {rate:>8} merges/s | best freq {best_frequency:>7} | vocab {vocab_size:>7} | "
+          "stats {stats_sec:.1f}s merge {merge_sec:.1f}s | elapsed {elapsed_sec:.1f}s".format(
+              rate="-" if metrics["merges_per_sec"] is None else "{:.1f}".format(metrics["merges_per_sec"]),
+              **metrics))
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
-    parser.add_argument("-t", "--use_bpe", type=bool, default=True)
+    parser.add_argument("-t", "--use_bpe", type=lambda s: s.lower() in ("true", "1", "yes"), default=True)
     parser.add_argument("-c", "--n_corpus", type=int, default=40000)
     parser.add_argument("-i", "--n_iter", type=int, default=30000)
+    parser.add_argument("-f", "--min_frequency", type=int, default=2,
+                        help="stop training once the best pair occurs fewer times than this")
+    parser.add_argument("-v", "--vocab_size", type=int, default=None,
+                        help="stop training once the vocabulary reaches this size")
+    parser.add_argument("-w", "--num_workers", type=int, default=None)
+    parser.add_argument("--num_threads", type=int, default=16,
+                        help="threads used to read the story files")
+    parser.add_argument("--archive_path", type=str, default=None,
+                        help="cache the loaded stories in this single archive file")
+    parser.add_argument("-s", "--stream", action="store_true",
+                        help="read documents straight from the .tgz instead of loading them all")
+    parser.add_argument("--save_path", type=str, default=None,
+                        help="save the trained BPE merges to this binary model file")
+    parser.add_argument("--checkpoint_path", type=str, default=None,
+                        help="periodically save the training state here")
+    parser.add_argument("--checkpoint_every", type=int, default=1000,
+                        help="merges between checkpoints")
+    parser.add_argument("--resume_from", type=str, default=None,
+                        help="continue training from this checkpoint")
+    parser.add_argument("-r", "--report_every", type=int, default=None,
+                        help="print training progress every N merges")
+    parser.add_argument("-n", "--normalize", choices=["NFC", "NFKC", "NFD", "NFKD"], default=None,
+                        help="Unicode normalization applied before splitting words")
+    parser.add_argument("-p", "--split_punctuation", action="store_true",
+                        help="split punctuation off words into separate tokens")
+    parser.add_argument("-d", "--digits", choices=PreTokenizer.DIGIT_MODES, default="keep",
+                        help="how digits are split into words")
+    parser.add_argument("-b", "--byte_level", action="store_true",
+                        help="train BPE on UTF-8 bytes so any text round-trips losslessly")
+    parser.add_argument("--load_path", type=str, default=None,
+                        help="load a saved BPE model instead of training one")
+    parser.add_argument("--shard_prefix", type=str, default=None,
+                        help="encode the corpus into token shards {prefix}_00000.bin/.idx instead of printing ids")
+    parser.add_argument("--shard_tokens", type=int, default=1 << 28,
+                        help="maximum tokens per shard")
+    parser.add_argument("--buffer_tokens", type=int, default=1 << 20,
+                        help="tokens buffered in memory before each write")
     args = parser.parse_args()
+    if (args.load_path or args.shard_prefix) and not args.use_bpe:
+        parser.error("--load_path and --shard_prefix require the BPE tokenizer")
 
     use_bpe = args.use_bpe
     n_corpus = args.n_corpus
     n_iter = args.n_iter
-    corpus = load_corpus(n=n_corpus)
-
     SelectedTokenizer = BPETokenizer if use_bpe else WordTokenizer
-    tokenizer = SelectedTokenizer(corpus[:n_corpus//2])
-    tokenizer.add_corpus(corpus[n_corpus//2:])
-    tokenizer.train(n_iter=n_iter)
-
-    input_ids = tokenizer.tokenize(
-        corpus[:10],
-        #padding=True,
-        #max_length=1024
+    if args.load_path:
+        tokenizer = BPETokenizer.load(args.load_path)
+        byte_level = tokenizer.byte_level
+    else:
+        byte_level = use_bpe and args.byte_level
+    pre_tokenizer = PreTokenizer(
+        unicode_form=args.normalize,
+        strip_newlines=not byte_level,
+        lowercase=not byte_level,
+        split_punctuation=args.split_punctuation,
+        digits=args.digits,
+        keep_whitespace=byte_level
     )
-    print(input_ids)
+    options = {"pre_tokenizer": pre_tokenizer}
+    if byte_level:
+        options["byte_level"] = True
+
+    if args.load_path:
+        tokenizer.pre_tokenizer = pre_tokenizer
+        corpus = list(stream_corpus(n=10)) if args.stream else load_corpus(
+            n=n_corpus, num_threads=args.num_threads, archive_path=args.archive_path)
+    elif args.stream:
+        stream = stream_corpus(n=n_corpus)
+        tokenizer = SelectedTokenizer(islice(stream, n_corpus//2), num_workers=args.num_workers, **options)
+        tokenizer.add_corpus(stream, num_workers=args.num_workers)
+        corpus = list(stream_corpus(n=10))
+    else:
+        corpus = load_corpus(n=n_corpus, num_threads=args.num_threads, archive_path=args.archive_path)
+        tokenizer = SelectedTokenizer(corpus[:n_corpus//2], num_workers=args.num_workers, **options)
+        tokenizer.add_corpus(corpus[n_corpus//2:], num_workers=args.num_workers)
+    if use_bpe and not args.load_path:
+        reason = tokenizer.train(
+            n_iter=n_iter,
+            min_frequency=args.min_frequency,
+            vocab_size=args.vocab_size,
+            checkpoint_path=args.checkpoint_path,
+            checkpoint_every=args.checkpoint_every,
+            resume_from=args.resume_from,
+            callback=print_progress if args.report_every else None,
+            report_every=args.report_every or 1000
+        )
+        print("Training stopped after {} merges: {}".format(len(tokenizer.record), reason))
+        if args.save_path:
+            tokenizer.save(args.save_path)
+    elif not use_bpe:
+        tokenizer.train(n_iter=n_iter)
 
+    if args.shard_prefix:
+        texts = stream_corpus(n=n_corpus) if args.stream else corpus
+        writer = write_shards(tokenizer, texts, args.shard_prefix, args.num_workers,
+                              args.shard_tokens, args.buffer_tokens)
+        print("Wrote {} documents ({} tokens, uint{}) to {} shards".format(
+            writer.n_docs, writer.n_tokens, 8 * writer.buffer.itemsize, len(writer.paths)))
+    else:
+        input_ids = tokenizer.encode_batch(
+            corpus[:10],
+            num_workers=args.num_workers,
+            padding=True,
+            max_length=1024
+        )
+        print([ids.tolist() for ids in input_ids])
@@ -0,0 +1,322 @@
+import unittest
+import os
+import random
+import shutil
+import tempfile
+from types import SimpleNamespace
+from unittest import mock
+from YBIGTA import serialization
+from YBIGTA.cache import LRUCache, entry_size
+from YBIGTA.preprocessor import PreTokenizer, split_words
+from YBIGTA.serialization import ShardWriter, TokenShard, save_model
+from YBIGTA.tokenizers import BPETokenizer, UNK_TOKEN
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def random_corpus(seed, n_texts=5, alphabet='abcd'):
+    # Short random words over a small alphabet, so many pairs tie and words merge down to one symbol
+    rng = random.Random(seed)
+    return [' '.join(''.join(rng.choice(alphabet) for _ in range(rng.randint(1, 5)))
+                     for _ in range(rng.randint(1, 8)))
+            for _ in range(n_texts)]
+
+
+def train_record(corpus, **kwargs):
+    tokenizer = BPETokenizer(corpus, byte_level=kwargs.pop('byte_level', False))
+    reason = tokenizer.train(**kwargs)
+    return list(tokenizer.record.items()), reason
+
+
+class TestLRUCache(unittest.TestCase):
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(max_size=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.put('c', 3)
+        self.assertEqual(list(cache.data), ['a', 'c'])
+        cache.put('a', 4)
+        cache.put('d', 5)
+        self.assertEqual(list(cache.data), ['a', 'd'])
+        self.assertEqual(cache.get('a'), 4)
+
+    def test_evicts_by_bytes(self):
+        value = ('token',) * 3
+        size = entry_size('key0', value)
+        cache = LRUCache(max_size=None, max_bytes=size * 2)
+        for i in range(5):
+            cache.put('key{}'.format(i), value)
+            self.assertLessEqual(cache.bytes, size * 2)
+        self.assertEqual(list(cache.data), ['key3', 'key4'])
+        self.assertEqual(cache.bytes, sum(cache.sizes.values()))
+
+        # An entry larger than the limit is not kept at all
+        cache.put('big', ('x' * 1000,))
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.bytes, 0)
+
+    def test_counters(self):
+        cache = LRUCache()
+        self.assertIsNone(cache.stats()['hit_rate'])
+        cache.put('a', 1)
+        cache.get('a')
+        cache.get('a')
+        cache.get('b')
+        self.assertEqual(cache.get('b', 'default'), 'default')
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['hit_rate'], stats['entries']), (2, 2, 0.5, 1))
+
+        # clear drops the entries but keeps the counters
+        cache.clear()
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['entries'], stats['bytes']), (2, 2, 0, 0))
+
+    def test_id_cache_cleared_by_add_corpus(self):
+        tokenizer = BPETokenizer(["the lowest fox"] * 3)
+        tokenizer.train(10)
+        unk_id = tokenizer.get_vocab()[UNK_TOKEN]
+        self.assertIn(unk_id, tokenizer.encode("ähm"))
+        self.assertIn("ähm", tokenizer.id_cache)
+
+        # After a new character is added, the cached IDs with <unk> must not be reused
+        tokenizer.add_corpus(["ähm"])
+        self.assertNotIn(unk_id, tokenizer.encode("ähm"))
+        self.assertEqual(tokenizer.decode(tokenizer.encode("ähm")), "ähm")
+
+
+class TestPreTokenizer(unittest.TestCase):
+
+    def setUp(self):
+        self.text = 'He said, "Room 101" costs $4.50!\nNext-day ２０２４ ﬁne.'
+
+    def test_default_matches_split_words(self):
+        rng = random.Random(0)
+        texts = [self.text, "", "  \n\n ", "a\nb c\td"] + [
+            ''.join(rng.choice('aZ1 \n\t,.-é') for _ in range(rng.randint(0, 40))) for _ in range(200)]
+        pre_tokenizer = PreTokenizer()
+        for text in texts:
+            self.assertEqual(pre_tokenizer(text), split_words(text), repr(text))
+
+    def test_split_punctuation(self):
+        self.assertEqual(PreTokenizer(split_punctuation=True)(self.text),
+                         ['he', 'said', ',', '"', 'room', '101', '"', 'costs', '$', '4', '.', '50', '!',
+                          'next', '-', 'day', '２０２４', 'ﬁne', '.'])
+
+    def test_digits(self):
+        text = 'room 101b costs $4.50'
+        self.assertEqual(PreTokenizer(digits='keep')(text), ['room', '101b', 'costs', '$4.50'])
+        self.assertEqual(PreTokenizer(digits='isolate')(text), ['room', '101', 'b', 'costs', '$', '4', '.', '50'])
+        self.assertEqual(PreTokenizer(digits='split')(text),
+                         ['room', '1', '0', '1', 'b', 'costs', '$', '4', '.', '5', '0'])
+        self.assertEqual(PreTokenizer(digits='zero')(text), ['room', '000b', 'costs', '$0.00'])
+        with self.assertRaises(ValueError):
+            PreTokenizer(digits='drop')
+
+    def test_unicode_form(self):
+        self.assertEqual(PreTokenizer()('２０２４ ﬁne'), ['２０２４', 'ﬁne'])
+        self.assertEqual(PreTokenizer(unicode_form='NFKC')('２０２４ ﬁne'), ['2024', 'fine'])
+        self.assertEqual(PreTokenizer(unicode_form='NFD')('é'), ['e\u0301'])
+
+    def test_keep_whitespace(self):
+        # Joining the words gives back the original text
+        for kwargs in ({}, {'split_punctuation': True}, {'digits': 'isolate'}, {'digits': 'split'}):
+            pre_tokenizer = PreTokenizer(strip_newlines=False, lowercase=False, keep_whitespace=True, **kwargs)
+            for text in [self.text, "  lead and trail  ", "\n", ""]:
+                self.assertEqual(''.join(pre_tokenizer(text)), text, (kwargs, text))
+        pre_tokenizer = PreTokenizer(strip_newlines=False, lowercase=False, keep_whitespace=True)
+        self.assertEqual(pre_tokenizer('Hi  there\nyou'), ['Hi', '  there', '\nyou'])
+
+
+class TestBPETrainer(unittest.TestCase):
+
+    def test_engines_match(self):
+        # Every engine must merge the same pairs in the same order, ties included
+        corpora = [["low lower newest widest low newest"]] + [random_corpus(seed) for seed in range(30)]
+        for corpus in corpora:
+            for byte_level in (False, True):
+                expected = train_record(corpus, n_iter=40, engine='naive', byte_level=byte_level)
+                for engine in ('incremental', 'array'):
+                    actual = train_record(corpus, n_iter=40, engine=engine, byte_level=byte_level)
+                    self.assertEqual(actual, expected, (corpus, byte_level, engine))
+
+    @unittest.skipIf(np is None, "requires numpy")
+    def test_numpy_stats_matches_dict(self):
+        # Corpora whose words all end up as single symbols used to crash the numpy recount
+        corpora = [['ab ab'], ['a'], ['a b c']] + [random_corpus(seed) for seed in range(30)]
+        for corpus in corpora:
+            for byte_level in (False, True):
+                for recount_every in (None, 1, 3):
+                    expected = train_record(corpus, n_iter=40, engine='array', stats='dict',
+                                            recount_every=recount_every, byte_level=byte_level)
+                    actual = train_record(corpus, n_iter=40, engine='array', stats='numpy',
+                                          recount_every=recount_every, byte_level=byte_level)
+                    self.assertEqual(actual, expected, (corpus, byte_level, recount_every))
+
+    def test_stop_conditions_match(self):
+        corpus = random_corpus(0, n_texts=20, alphabet='abcdef')
+        for kwargs in ({'n_iter': 10}, {'min_frequency': 3}, {'vocab_size': 15}, {}):
+            expected = train_record(corpus, engine='naive', **kwargs)
+            for engine in ('incremental', 'array'):
+                self.assertEqual(train_record(corpus, engine=engine, **kwargs), expected, (kwargs, engine))
+
+    def test_resume_from_checkpoint(self):
+        corpus = random_corpus(1, n_texts=20, alphabet='abcdef')
+        temp_dir = tempfile.mkdtemp()
+        path = os.path.join(temp_dir, "checkpoint")
+        for engine in ('naive', 'incremental', 'array'):
+            expected = train_record(corpus, n_iter=30, engine=engine)
+
+            # Stop after 12 merges (a checkpoint is also saved when training stops), then resume up to 30
+            interrupted = BPETokenizer(corpus)
+            interrupted.train(n_iter=12, engine=engine, checkpoint_path=path, checkpoint_every=5)
+            resumed = BPETokenizer(corpus)
+            resumed.train(n_iter=30, engine=engine, resume_from=path)
+            self.assertEqual(list(resumed.record.items()), expected[0], engine)
+        shutil.rmtree(temp_dir)
+
+    def test_progress_reports(self):
+        corpus = ["low lower newest widest lowest low low"] * 3
+        fields = ('merges', 'best_pair', 'best_frequency', 'vocab_size', 'stop_reason')
+        for kwargs in ({'n_iter': 4}, {'min_frequency': 5}):
+            reports = {}
+            for engine in ('naive', 'incremental', 'array'):
+                blocks = []
+                BPETokenizer(corpus).train(engine=engine, callback=blocks.append, report_every=2, **kwargs)
+                reports[engine] = [tuple(block[field] for field in fields) for block in blocks]
+
+                # The last merge is reported once, with the stop reason and a rate
+                merges = [block['merges'] for block in blocks]
+                self.assertEqual(len(merges), len(set(merges)), (kwargs, engine))
+                self.assertIsNotNone(blocks[-1]['merges_per_sec'])
+            self.assertEqual(reports['array'], reports['naive'], kwargs)
+            self.assertEqual(reports['incremental'], reports['naive'], kwargs)
+
+        # On a min_frequency stop, best_pair is the rejected pair as strings, not engine IDs
+        self.assertEqual(reports['naive'][-1][1:3], (('low', 'e'), 3))
+
+
+class TestBPETokenizer(unittest.TestCase):
+
+    def setUp(self):
+        self.corpus = ["the lowest fox jumps over the newest widest dog"] * 3
+        self.text = "the lowest fox"
+
+    def test_add_corpus_keeps_token_ids(self):
+        tokenizer = BPETokenizer(self.corpus)
+        tokenizer.train(30)
+        ids = tokenizer.encode(self.text).tolist()
+        tokens = list(tokenizer.id_to_token)
+
+        # New characters and merges get new IDs after the existing ones
+        tokenizer.add_corpus(["ähm cat"])
+        self.assertEqual(tokenizer.encode(self.text).tolist(), ids)
+        tokenizer.train(5)
+        self.assertEqual(tokenizer.id_to_token[:len(tokens)], tokens)
+        self.assertEqual(tokenizer.decode(tokenizer.encode("ähm cat")), "ähm cat")
+
+    def test_loaded_model_keeps_token_ids(self):
+        tokenizer = BPETokenizer(self.corpus)
+        tokenizer.train(30)
+        ids = tokenizer.encode(self.text).tolist()
+        temp_dir = tempfile.mkdtemp()
+        path = os.path.join(temp_dir, "model.bin")
+        tokenizer.save(path)
+
+        # Base characters that never merged must stay in the vocabulary of a loaded model
+        loaded = BPETokenizer.load(path)
+        loaded.add_corpus(["the cat"])
+        self.assertEqual(loaded.encode(self.text).tolist(), ids)
+        self.assertEqual(loaded.id_to_token[:len(tokenizer.id_to_token)], tokenizer.id_to_token)
+        del loaded
+        shutil.rmtree(temp_dir)
+
+    def test_load_legacy_special_tokens(self):
+        # Model files written before the special tokens were renamed still load
+        temp_dir = tempfile.mkdtemp()
+        path = os.path.join(temp_dir, "model.bin")
+        save_model(path, ["<pad>", "<unk>", "a", "b", "</w>", "ab", "ab</w>"], [(2, 3), (5, 4)])
+        tokenizer = BPETokenizer.load(path)
+        self.assertEqual(tokenizer.encode_batch(["ab c"], padding=True, max_length=4)[0].tolist(), [6, 1, 4, 0])
+        del tokenizer
+        shutil.rmtree(temp_dir)
+
+    def test_save_and_load(self):
+        temp_dir = tempfile.mkdtemp()
+        texts = ["the lowest dog", "unseen words here", "ÄÖÜ"]
+        for byte_level in (False, True):
+            tokenizer = BPETokenizer(self.corpus, byte_level=byte_level)
+            tokenizer.train(30)
+            path = os.path.join(temp_dir, "model.bin")
+            tokenizer.save(path)
+
+            loaded = BPETokenizer.load(path)
+            self.assertEqual(loaded.byte_level, byte_level)
+            self.assertEqual(loaded.get_vocab(), tokenizer.get_vocab())
+            self.assertEqual(loaded.encode_batch(texts), tokenizer.encode_batch(texts))
+            del loaded
+        shutil.rmtree(temp_dir)
+
+    def test_shards_match_encode_batch(self):
+        tokenizer = BPETokenizer(self.corpus)
+        tokenizer.train(30)
+        texts = random_corpus(2, n_texts=50, alphabet='thelowsfx') + [""]
+        expected = tokenizer.encode_batch(texts)
+
+        # Small shards and buffers so documents cross buffer flushes and shard boundaries
+        temp_dir = tempfile.mkdtemp()
+        prefix = os.path.join(temp_dir, "tokens")
+        with ShardWriter(prefix, len(tokenizer.get_vocab()), shard_tokens=40, buffer_tokens=7) as writer:
+            for ids in tokenizer.encode_stream(texts, chunk_size=8):
+                writer.add(ids)
+        self.assertGreater(len(writer.paths), 1)
+
+        actual = []
+        for path in writer.paths:
+            shard = TokenShard(path)
+            actual.extend(shard[i].tolist() for i in range(len(shard)))
+            del shard
+        self.assertEqual(actual, [ids.tolist() for ids in expected])
+        shutil.rmtree(temp_dir)
+
+    def test_byte_level_round_trip(self):
+        tokenizer = BPETokenizer(self.corpus + ["Ünïcödé, 数字 123!\n\tTabs  and  spaces"], byte_level=True)
+        tokenizer.train(50)
+        for text in ["The Lowest FOX\n", "  leading and trailing  ", "처음 보는 글자 🦊", "", "a\r\nb"]:
+            self.assertEqual(tokenizer.decode(tokenizer.encode(text)), text)
+
+        # Learned symbols spelling a special token must not take the special token's ID
+        tokenizer = BPETokenizer(['<pad>'] * 50 + ['<unk>'] * 50, byte_level=True)
+        tokenizer.train(20)
+        self.assertEqual(tokenizer.decode(tokenizer.encode('<pad> <unk>')), '<pad> <unk>')
+
+
+    def test_big_endian_host(self):
+        # On a big-endian host the writers swap to little-endian and the readers must swap back.
+        # Pretending to be big-endian on a little-endian host swaps both ways, which must round-trip.
+        tokenizer = BPETokenizer(self.corpus)
+        tokenizer.train(30)
+        texts = ["the lowest dog", "newest fox"]
+        expected = [ids.tolist() for ids in tokenizer.encode_batch(texts)]
+        temp_dir = tempfile.mkdtemp()
+        path = os.path.join(temp_dir, "model.bin")
+        prefix = os.path.join(temp_dir, "tokens")
+        with mock.patch.object(serialization, 'sys', SimpleNamespace(byteorder='big')):
+            tokenizer.save(path)
+            loaded = BPETokenizer.load(path)
+            self.assertEqual([ids.tolist() for ids in loaded.encode_batch(texts)], expected)
+            with ShardWriter(prefix, len(tokenizer.get_vocab())) as writer:
+                for ids in tokenizer.encode_batch(texts):
+                    writer.add(ids)
+            shard = TokenShard(writer.paths[0])
+            self.assertEqual([shard[i].tolist() for i in range(len(shard))], expected)
+        del loaded, shard
+        shutil.rmtree(temp_dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,9 @@
 # commands/base_command.py
 import os
-from typing import List
+import sys
+import time
+from collections import OrderedDict
+from typing import Hashable, List, Optional, TextIO, Tuple
 
 """
 TODO 3-1: The BaseCommand class has a show_usage method implemented, but the execute method is not 
@@ -24,6 +27,156 @@ BaseCommand.update_current_path 선언을 하면 current_path를 한번에 업
 JAVA에서 static method, variable이 하는 역할과 비슷합니다.
 
 """
+class OutputSink:
+    """
+    Buffered output shared by all commands.
+
+    Text is collected in memory and written to the stream in one call once more than
+    buffer_size characters are buffered, or when a write arrives max_delay seconds or more
+    after the last flush. There is no timer: buffered text is not written while no writes
+    arrive, so commands must flush before they block (e.g. before input(), or before waiting
+    for the next file in grep) and when they finish.
+
+    If the reader of the stream goes away (BrokenPipeError, e.g. piping into head),
+    stdout is redirected to os.devnull and the rest of the output is discarded.
+
+    Attributes:
+        stream (Optional[TextIO]): Where to write. None means whatever sys.stdout is at flush time.
+        buffer_size (int): Number of buffered characters that triggers a flush.
+        max_delay (float): Seconds after which buffered text is flushed on the next write.
+    """
+
+    def __init__(self, stream: Optional[TextIO] = None, buffer_size: int = 1 << 16,
+                 max_delay: float = 0.1) -> None:
+        self.stream = stream
+        self.buffer_size = buffer_size
+        self.max_delay = max_delay
+        self.parts = []
+        self.size = 0
+        self.last_flush = time.monotonic()
+        self.broken = False
+
+    def write(self, text: str) -> None:
+        """
+        Buffer text, flushing if the size or time threshold is reached.
+        """
+        if self.broken:
+            return
+        self.parts.append(text)
+        self.size += len(text)
+        if self.size >= self.buffer_size or time.monotonic() - self.last_flush >= self.max_delay:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Write all buffered text to the stream.
+        """
+        if self.parts and not self.broken:
+            stream = self.stream if self.stream is not None else sys.stdout
+            try:
+                stream.write(''.join(self.parts))
+                stream.flush()
+            except BrokenPipeError:
+                self._discard_output(stream)
+        self.parts.clear()
+        self.size = 0
+        self.last_flush = time.monotonic()
+
+    def _discard_output(self, stream: TextIO) -> None:
+        """
+        Stop writing after a broken pipe. Pointing the file descriptor at os.devnull also keeps
+        Python from raising again when it flushes stdout at exit.
+        """
+        self.broken = True
+        try:
+            devnull = os.open(os.devnull, os.O_WRONLY)
+            os.dup2(devnull, stream.fileno())
+            os.close(devnull)
+        except (OSError, ValueError):
+            pass
+
+
+class DirectoryCache:
+    """
+    Metadata of recently listed directories, so listing an unchanged directory again
+    costs one stat call instead of one per entry.
+
+    Each directory is stored with a key made of its device, inode and modification time.
+    Creating, removing or renaming an entry changes the directory's mtime, which makes the
+    cached listing stale. Changes to a file's contents do not touch its directory, so sizes and
+    times of files modified in place are only refreshed once the directory itself changes.
+    Commands that change directories (mv, cp) also invalidate them explicitly.
+
+    An mtime only proves a listing is current if the directory cannot change again within the
+    same timestamp tick. File systems with coarse timestamps (FAT, some NFS servers) can change a
+    directory twice without the mtime moving, so, as in git's "racy" index check, a listing is not
+    cached when the directory's mtime is less than mtime_granularity seconds before the scan.
+    Such a directory is scanned again on every listing until its last change is old enough.
+
+    Attributes:
+        max_dirs (int): Number of directories kept. The least recently used one is dropped first.
+        mtime_granularity (float): Seconds within which a modification time cannot be trusted.
+        dirs (OrderedDict): Absolute path -> (key, entries), in least recently used order.
+        hits (int): Listings answered from the cache.
+        misses (int): Listings that had to scan the directory.
+    """
+
+    def __init__(self, max_dirs: int = 128, mtime_granularity: float = 2.0) -> None:
+        self.max_dirs = max_dirs
+        self.mtime_granularity = mtime_granularity
+        self.dirs = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, dir_path: str) -> Hashable:
+        """
+        Stat the directory and return the key its cached entries must match.
+        """
+        stats = os.stat(dir_path)
+        return (stats.st_dev, stats.st_ino, stats.st_mtime_ns)
+
+    def get(self, dir_path: str, key: Hashable) -> Optional[List[Tuple]]:
+        """
+        Return the cached entries of a directory, or None if missing or stale.
+        """
+        path = os.path.abspath(dir_path)
+        cached = self.dirs.get(path)
+        if cached is None or cached[0] != key:
+            self.misses += 1
+            return None
+        self.dirs.move_to_end(path)
+        self.hits += 1
+        return cached[1]
+
+    def put(self, dir_path: str, key: Hashable, entries: List[Tuple]) -> None:
+        """
+        Store the entries of a directory. key must be taken before the directory was scanned.
+
+        Listings of directories modified too recently to be trusted are not stored.
+        """
+        path = os.path.abspath(dir_path)
+        if time.time_ns() - key[2] < self.mtime_granularity * 1e9:
+            self.dirs.pop(path, None)
+            return
+        self.dirs[path] = (key, entries)
+        self.dirs.move_to_end(path)
+        while len(self.dirs) > self.max_dirs:
+            self.dirs.popitem(last=False)
+
+    def invalidate(self, *paths: str) -> None:
+        """
+        Forget the cached entries of the given directories.
+        """
+        for path in paths:
+            self.dirs.pop(os.path.abspath(path), None)
+
+    def clear(self) -> None:
+        """
+        Forget all cached directories. The hit and miss counters are kept.
+        """
+        self.dirs.clear()
+
+
 class BaseCommand:
     """
     Base class for all commands. Each command should inherit from this class and 
@@ -34,9 +187,13 @@ class BaseCommand:
 
     Attributes:
         current_path (str): The current path. Usefull for commands like ls, cd, etc.
+        output (OutputSink): Buffered output shared by all commands. Use self.print to write to it.
+        directory_cache (DirectoryCache): Entry metadata of recently listed directories.
     """
 
     current_path = os.getcwd()
+    output = OutputSink()
+    directory_cache = DirectoryCache()
 
     @classmethod
     def update_current_path(cls, new_path: str):
@@ -62,12 +219,19 @@ class BaseCommand:
         self.description = 'Helpful description of the command'
         self.usage = 'Usage: command [options] [arguments]'
 
+    def print(self, *values, sep: str = ' ', end: str = '\n') -> None:
+        """
+        Write values like the built-in print, but through the shared buffered output.
+        """
+        BaseCommand.output.write(sep.join(str(value) for value in values) + end)
+
     def show_usage(self) -> None:
         """
         Show the command usage.
         """
-        print(self.description)
-        print(self.usage)
+        self.print(self.description)
+        self.print(self.usage)
+        self.output.flush()
 
     def execute(self) -> None:
         """
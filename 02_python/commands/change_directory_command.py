@@ -36,7 +36,7 @@ class ChangeDirectoryCommand(BaseCommand):
         try:
             # if -v is given, print the directory transition process.
             if '-v' in self.options:
-                print("%s: changing directory to '%s'" %(self.name, self.destination_dir))
+                self.print("%s: changing directory to '%s'" %(self.name, self.destination_dir))
             
             destination = os.path.join(self.current_path, self.destination_dir)
             if not os.path.exists(destination):
@@ -46,5 +46,7 @@ class ChangeDirectoryCommand(BaseCommand):
                 os.chdir(self.current_path)
                             
         except FileNotFoundError:
-            print("%s: cannot change directory to '%s': [Errno 2] No such file or directory: '%s'"
-                  %(self.name, self.destination_dir, self.destination_dir))
\ No newline at end of file
+            self.print("%s: cannot change directory to '%s': [Errno 2] No such file or directory: '%s'"
+                       %(self.name, self.destination_dir, self.destination_dir))
+        finally:
+            self.output.flush()
\ No newline at end of file
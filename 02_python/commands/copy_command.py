@@ -40,8 +40,8 @@ class CopyCommand(BaseCommand):
             # if -v is given, print the file transition process.
             # It does not matter whether the transition was successful.
             if '-v' in self.options:
-                print("%s: copying '%s' to '%s'" 
-                      %(self.name, self.source_dir, self.destination_dir))
+                self.print("%s: copying '%s' to '%s'" 
+                           %(self.name, self.source_dir, self.destination_dir))
             
             # Check if the file exists in the source directory.
             if not self.file_exists(self.current_path, self.source_dir):
@@ -49,14 +49,17 @@ class CopyCommand(BaseCommand):
             
             origin = os.path.join(self.current_path, self.source_dir)
             target = os.path.join(self.current_path, self.destination_dir)
+            # Cached listings of the source and destination directories will be stale
+            BaseCommand.directory_cache.invalidate(os.path.dirname(origin), target, os.path.dirname(target))
             
             # If -i is given and the file already exists in the destination directory,
             # provide the overwrite option (y/n).
             if '-i' in self.options:
                 if self.file_exists(self.destination_dir, self.source_dir):
-                    print("%s: overwrite '%s/%s'? (y/n)"
-                          %(self.name, self.destination_dir, self.source_dir))
+                    self.print("%s: overwrite '%s/%s'? (y/n)"
+                               %(self.name, self.destination_dir, self.source_dir))
                     
+                    self.output.flush()
                     answer = input(">> ")
                     if answer == "y":
                         shutil.copy(origin, target)
@@ -68,9 +71,11 @@ class CopyCommand(BaseCommand):
                 shutil.copy(origin, target)
 
         except FileNotFoundError as e:
-            print("%s: '%s' does not exist."
-                  %(self.name, self.source_dir))
-        
+            self.print("%s: '%s' does not exist."
+                       %(self.name, self.source_dir))
+        finally:
+            self.output.flush()
+
 
     def file_exists(self, directory: str, file_name: str) -> bool:
         """
@@ -1,5 +1,12 @@
+import codecs
+import io
+import locale
+import mmap
+import os
 import re
-from typing import List
+import stat
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Optional
 from .base_command import BaseCommand
 
 """
@@ -15,56 +22,282 @@ Use breakpoint() and following commands to debug:
 """
 
 class GrepCommand(BaseCommand):
+    # Number of leading bytes checked for NUL bytes to decide whether a file is binary.
+    BINARY_CHECK_SIZE = 8192
+    # Characters that make a pattern a regular expression rather than a literal string.
+    REGEX_CHARS = set('.^$*+?{}[]\\|()')
+    # Pattern fragments whose meaning can change when searching a whole buffer instead of one line.
+    LINE_ONLY_TOKENS = ('$', '\\A', '\\Z', '(?')
+    # ASCII bytes that \s matches in a str regex but not in a bytes regex.
+    UNSAFE_BYTES = (b'\x1c', b'\x1d', b'\x1e', b'\x1f')
+    # Size of the chunks copied out of the memory map when checking which bytes a file contains.
+    CHUNK_SIZE = 1 << 24
+
     def __init__(self, options: List[str], args: List[str]) -> None:
         """
         Initialize the GrepCommand object.
 
         Args:
             options (List[str]): List of command options.
-            args (List[str]): List of command arguments (pattern and file name).
+            args (List[str]): List of command arguments (pattern and file names).
         """
         super().__init__(options, args)
 
         # Override the attributes inherited from BaseCommand
-        self.description = 'Search for a pattern in a file'
-        self.usage = 'Usage: grep [OPTION]... PATTERN FILE'
+        self.description = 'Search for a pattern in files'
+        self.usage = 'Usage: grep [OPTION]... PATTERN [FILE]...'
         
         # Command-specific attributes go here
         self.name = 'grep'
         self.pattern = args[0] if args else ''
-        self.file = args[1] if len(args) > 1 else ''
+        self.files = args[1:]
+        self.file = self.files[0] if self.files else ''
         self.options = options
+        self.max_workers = min(32, (os.cpu_count() or 1) + 4)
+        self.use_mmap = True
+        self._literal = None
+        self._bytes_pattern = None
+        self._ascii_only = False
+        self._anchored = False
 
     def execute(self) -> None:
         """
         Execute the grep command.
+        Files are searched in parallel on a thread pool, but the output always follows
+        the order of the file arguments (and sorted order inside directories).
+        Binary files (files with a NUL byte near the start) are skipped.
         Supported options:
             -n: Prefix each line of output with the line number within its input file.
+            -r: Search directories recursively. Without file arguments, search the current directory.
         """
         # Compile the pattern
         pattern = re.compile(self.pattern)
+        self._prepare_fast_path()
+        show_line_number = '-n' in self.options
+        recursive = '-r' in self.options
+
+        files = self.files if self.files or not recursive else ['.']
+        show_file_name = len(files) > 1 or (recursive and any(os.path.isdir(f) for f in files))
 
-        # Process the file
+        # Process the files
+        search = lambda path: self.search_file(path, pattern, show_line_number, show_file_name)
         try:
-            with open(self.file, 'r') as file:
-                for line_number, line in enumerate(file, start=1):
-                    result = pattern.search(line)
-                    
-                    if result and "-n" in self.options:
-                        self.print_line(line_number, line, show_line_number = True)
-                    elif result and "-n" not in self.options:
-                        self.print_line(line_number, line, show_line_number = False)
-                    else:
-                        pass
-                        
-        except FileNotFoundError:
-            print(f"grep: {self.file}: No such file or directory")
-
-    def print_line(self, line_number, line, show_line_number):
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = [executor.submit(search, path) for path in self._expand_paths(files, recursive)]
+                for future in futures:
+                    # Don't hold buffered matches back while waiting for a slow file
+                    if not future.done():
+                        self.output.flush()
+                    for line in future.result():
+                        self.print(line)
+        finally:
+            self.output.flush()
+
+    def _prepare_fast_path(self) -> None:
         """
-        Print the matched line with or without the line number.
+        Decide whether files can be scanned as raw bytes instead of line by line.
+
+        Literal patterns are searched with bytes.find. Other ASCII patterns are compiled as a
+        bytes regex (in MULTILINE mode) that finds candidate lines, each of which is then checked
+        with the original pattern. Patterns using $, \\A, \\Z or (?...) always use the line-by-line path.
+        Patterns with constructs that see non-ASCII text differently as bytes (see
+        _matches_bytes_alike) only use the bytes regex on files that are plain ASCII, and patterns
+        using ^ only on files without \\r, after which the bytes regex does not see a line start.
+        Both fast paths assume the files are read as UTF-8, like the line-by-line path does here.
+        """
+        self._literal = self._bytes_pattern = None
+        self._ascii_only = self._anchored = False
+        if not self.use_mmap or codecs.lookup(locale.getpreferredencoding(False)).name != 'utf-8':
+            return
+        if not self.REGEX_CHARS & set(self.pattern):
+            self._literal = self.pattern.encode('utf-8')
+        elif self.pattern.isascii() and not any(token in self.pattern for token in self.LINE_ONLY_TOKENS):
+            try:
+                self._bytes_pattern = re.compile(self.pattern.encode('ascii'), re.MULTILINE)
+            except re.error:
+                return
+            self._ascii_only = not self._matches_bytes_alike(self.pattern)
+            self._anchored = '^' in self.pattern
+
+    @staticmethod
+    def _matches_bytes_alike(pattern: str) -> bool:
+        """
+        Check that an ASCII pattern finds every match in UTF-8 bytes that it finds in the decoded text.
+
+        Such a pattern is built from ASCII characters, positive character classes, alternations,
+        groups, quantifiers, ^ and escaped punctuation, so its matches are ASCII and appear as the
+        same bytes. The dot, negated classes and letter or digit escapes (\\w, \\s, \\d, \\b, \\x..,
+        backreferences) can match or treat a multi-byte character differently.
+        """
+        escaped = False
+        for i, char in enumerate(pattern):
+            if escaped:
+                if char.isalnum():
+                    return False
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '.' or pattern.startswith('[^', i):
+                return False
+        return True
+
+    def _expand_paths(self, files: List[str], recursive: bool) -> Iterator[str]:
+        """
+        Yield the paths to search, walking directories in sorted order if recursive is True.
+        Inside walked directories only regular files are searched, so FIFOs, sockets and devices
+        cannot block the search. Files named on the command line are always searched.
+        """
+        for path in files:
+            if recursive and os.path.isdir(path):
+                for dir_path, dir_names, file_names in os.walk(path):
+                    dir_names.sort()
+                    for file_name in sorted(file_names):
+                        file_path = os.path.join(dir_path, file_name)
+                        try:
+                            is_regular = stat.S_ISREG(os.stat(file_path).st_mode)
+                        except OSError:
+                            is_regular = True  # Let search_file report the error (e.g. a broken symlink)
+                        if is_regular:
+                            yield file_path
+            else:
+                yield path
+
+    def search_file(self, path: str, pattern: re.Pattern, show_line_number: bool,
+                    show_file_name: bool) -> List[str]:
+        """
+        Search one file and return its formatted output lines (or an error message).
+
+        Args:
+            path (str): The file to search.
+            pattern (re.Pattern): The compiled pattern.
+            show_line_number (bool): Whether to prefix matches with their line number.
+            show_file_name (bool): Whether to prefix matches with the file name.
+
+        Returns:
+            List[str]: The lines to print for this file. Empty for binary files.
+        """
+        if os.path.isdir(path):
+            return [f"grep: {path}: Is a directory"]
+        try:
+            # peek does not move the position, so pipes and other non-seekable files can still be read from the start
+            with open(path, 'rb', buffering=self.BINARY_CHECK_SIZE) as file:
+                if b'\0' in file.peek(self.BINARY_CHECK_SIZE)[:self.BINARY_CHECK_SIZE]:
+                    return []
+                file_name = path if show_file_name else None
+                lines = self._search_mapped(file, pattern, show_line_number, file_name)
+                if lines is not None:
+                    return lines
+
+                lines = []
+                for line_number, line in enumerate(io.TextIOWrapper(file, errors='replace'), start=1):
+                    if pattern.search(line):
+                        lines.append(self.format_line(line_number, line, show_line_number, file_name))
+                return lines
+        except OSError as e:
+            return [f"grep: {path}: {e.strerror or e}"]
+
+    def _search_mapped(self, file, pattern: re.Pattern, show_line_number: bool,
+                       file_name: Optional[str]) -> Optional[List[str]]:
+        """
+        Search a memory-mapped file without splitting it into lines.
+
+        Matches are found in the whole buffer, and only the lines containing them are decoded.
+        Line numbers are recovered by counting newlines between consecutive matches. Like text
+        mode, \\r and \\r\\n also end lines; this is only checked in the parts of the file that contain a \\r.
+
+        Returns:
+            Optional[List[str]]: The formatted lines, or None if the file must be searched line by line.
+        """
+        if self._literal is None and self._bytes_pattern is None:
+            return None
+        # Pipes and special files (e.g. /proc files, which report a size of 0) cannot be mapped
+        stats = os.fstat(file.fileno())
+        if not stat.S_ISREG(stats.st_mode) or stats.st_size == 0:
+            return None
+
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            if self._literal is not None:
+                literal = self._literal
+                find = lambda pos: buffer.find(literal, pos)
+            else:
+                if self._ascii_only and not self._is_plain_ascii(buffer):
+                    return None
+                if self._anchored and buffer.find(b'\r') >= 0:
+                    return None
+                bytes_pattern = self._bytes_pattern
+
+                def find(pos):
+                    match = bytes_pattern.search(buffer, pos)
+                    return match.start() if match else -1
+
+            lines = []
+            size = len(buffer)
+            verify = self._literal is None
+            # counted is the start of the line numbered line_number; newlines before it are already counted.
+            pos = counted = 0
+            line_number = 1
+            # First \r at or after counted (size if there is none), searched again only once passed.
+            next_cr = -1
+            while pos < size:
+                start = find(pos)
+                if start < 0 or start >= size:
+                    break
+                newline = buffer.rfind(b'\n', pos, start) if start > pos else -1
+                line_start = pos if newline < 0 else newline + 1
+                newline = buffer.find(b'\n', start)
+                line_end = size if newline < 0 else newline + 1
+
+                if next_cr < counted:
+                    next_cr = buffer.find(b'\r', counted)
+                    if next_cr < 0:
+                        next_cr = size
+                has_cr = next_cr < line_end
+                if has_cr:
+                    # Narrow the line to the \r, \r\n or \n separated line holding the match
+                    line_start = buffer.rfind(b'\r', line_start, start) + 1 or line_start
+                    cr = buffer.find(b'\r', start, line_end)
+                    if cr >= 0:
+                        line_end = cr + 2 if buffer[cr + 1:cr + 2] == b'\n' else cr + 1
+                pos = line_end
+
+                line = buffer[line_start:line_end].decode('utf-8', errors='replace')
+                if has_cr and line.endswith('\r'):
+                    line = line[:-1] + '\n'
+                elif has_cr and line.endswith('\r\n'):
+                    line = line[:-2] + '\n'
+                if verify and not pattern.search(line):
+                    continue
+                if line_start > counted:
+                    gap = buffer[counted:line_start]
+                    line_number += gap.count(b'\n')
+                    if has_cr:
+                        line_number += gap.count(b'\r') - gap.count(b'\r\n')
+                lines.append(self.format_line(line_number, line, show_line_number, file_name))
+                counted = line_end
+                line_number += 1
+            return lines
+
+    def _is_plain_ascii(self, buffer: mmap.mmap) -> bool:
+        """
+        Check, chunk by chunk, that the buffer is ASCII without the \\x1c-\\x1f separators.
+        """
+        for start in range(0, len(buffer), self.CHUNK_SIZE):
+            chunk = buffer[start:start + self.CHUNK_SIZE]
+            if not chunk.isascii() or any(byte in chunk for byte in self.UNSAFE_BYTES):
+                return False
+        return True
+
+    def format_line(self, line_number, line, show_line_number, file_name=None) -> str:
         """
+        Format the matched line with or without the file name and line number.
+        """
+        prefix = f"{file_name}:" if file_name is not None else ''
         if show_line_number:
-            print(f"{line_number}:{line.strip()}")
-        else:
-            print(line.strip())
+            return f"{prefix}{line_number}:{line.strip()}"
+        return prefix + line.strip()
+
+    def print_line(self, line_number, line, show_line_number, file_name=None):
+        """
+        Print the matched line with or without the line number.
+        """
+        self.print(self.format_line(line_number, line, show_line_number, file_name))
@@ -1,8 +1,10 @@
 # commands/list_command.py
 from .base_command import BaseCommand
+import heapq
 import os
 import time
-from typing import List
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Tuple
 
 # TODO 4-1: Debug and fix the AttributeError
 # TODO 4-2: Fix the bug of ls -l -t -h now showing the file in order of modified time.
@@ -17,7 +19,7 @@ class ListCommand(BaseCommand):
 
         # Override the attributes inherited from BaseCommand
         self.description = 'List the contents of the current directory or specified path'
-        self.usage = 'Usage: ls [path]'
+        self.usage = 'Usage: ls [-l] [-h] [-t] [--stream] [--limit=N] [--offset=N] [path]'
 
         # Command-specific attributes go here
         self.name = 'ls'
@@ -31,29 +33,68 @@ class ListCommand(BaseCommand):
             -l: Display files in long format
             -h: Display file sizes in human-readable format
             -t: Sort files by modified time
+            --stream: With -l, stat and print entries as os.scandir yields them, without
+                      reading the whole directory first or using the directory cache
+            --limit=N: Print at most N entries
+            --offset=N: Skip the first N entries
+        With -t and --limit, only the newest offset + limit entries are kept (in a heap),
+        so the directory is never sorted in full.
         """
         # Handle options like -l, -a, etc.
         # List the current directory or specified path
         human_readable = '-h' in self.options
         sort_by_modified_time = '-t' in self.options
-        if '-l' in self.options:
-            self._list_files_detailed(self.target_path, human_readable, sort_by_modified_time)
-        else:
-            self._list_files(self.target_path)
+        stream = '--stream' in self.options
+        try:
+            limit = self._option_value('--limit')
+            offset = self._option_value('--offset') or 0
+            if '-l' in self.options:
+                self._list_files_detailed(self.target_path, human_readable, sort_by_modified_time,
+                                          offset, limit, stream)
+            else:
+                self._list_files(self.target_path, offset, limit)
+        except ValueError as e:
+            self.print(f"{self.name}: {e}")
+        finally:
+            self.output.flush()
 
-    def _list_files(self, dir_path: str) -> None:
+    def _option_value(self, name: str) -> Optional[int]:
         """
-        Lists the files in the specified directory.
+        Returns the value of an option given as name=N, or None if the option is absent.
+
+        Raises:
+            ValueError: If the value is not a non-negative integer.
+        """
+        for option in self.options:
+            if option.startswith(name + '='):
+                value = option[len(name) + 1:]
+                if not value.isdigit():
+                    raise ValueError(f"invalid {name} value '{value}'")
+                return int(value)
+        return None
+
+    def _paginate(self, entries: Iterable, offset: int = 0, limit: Optional[int] = None) -> Iterator:
+        """
+        Returns an iterator over the entries after skipping offset of them, stopping after limit.
+        """
+        return islice(entries, offset, None if limit is None else offset + limit)
+
+    def _list_files(self, dir_path: str, offset: int = 0, limit: Optional[int] = None) -> None:
+        """
+        Lists the files in the specified directory, in the order os.scandir yields them.
 
         Args:
             dir_path (str): The path of the directory to list files from.
+            offset (int, optional): Number of entries to skip. Defaults to 0.
+            limit (Optional[int], optional): Maximum number of entries to list. Defaults to None (all).
         """
         with os.scandir(dir_path) as it:
-            for entry in it:
-                print(entry.name)
+            for entry in self._paginate(it, offset, limit):
+                self.print(entry.name)
 
     def _list_files_detailed(self, dir_path: str, human_readable: bool = False,
-                             sort_by_modified_time: bool = False) -> None:
+                             sort_by_modified_time: bool = False, offset: int = 0,
+                             limit: Optional[int] = None, stream: bool = False) -> None:
         """
         Lists the files in the specified directory with detailed information.
 
@@ -61,22 +102,55 @@ class ListCommand(BaseCommand):
             dir_path (str): The path of the directory to list files from.
             human_readable (bool, optional): Whether to display file sizes in human-readable format. Defaults to False.
             sort_by_modified_time (bool, optional): Whether to sort files by modified time. Defaults to False.
+            offset (int, optional): Number of entries to skip. Defaults to 0.
+            limit (Optional[int], optional): Maximum number of entries to list. Defaults to None (all).
+            stream (bool, optional): Whether to stat entries while scanning instead of using
+                                     the directory cache. Defaults to False.
+        """
+        files = self._scan_entries(dir_path) if stream else self._read_entries(dir_path)
+        if sort_by_modified_time:
+            # Sort by modified time, newest first. nlargest keeps ties in the same order as sorted.
+            if limit is None:
+                files = sorted(files, key=lambda x: x[1], reverse=True)
+            else:
+                files = heapq.nlargest(offset + limit, files, key=lambda x: x[1])
+
+        for name, modified_time, size in self._paginate(files, offset, limit):
+            last_modified = time.ctime(modified_time)
+            size = self.human_readable_size(size) if human_readable else size
+            self.print(f"{name:20} {last_modified:20} {size:10}")
+
+    def _read_entries(self, dir_path: str) -> List[Tuple[str, float, int]]:
+        """
+        Returns the name, modified time and size of every entry in the directory.
+        If the directory has not changed since it was last read, the entries come from
+        BaseCommand.directory_cache and only the directory itself is stat'ed.
+
+        Args:
+            dir_path (str): The path of the directory to read.
+
+        Returns:
+            List[Tuple[str, float, int]]: (name, st_mtime, st_size) in os.scandir order. Do not modify it.
+        """
+        cache = BaseCommand.directory_cache
+        key = cache.key(dir_path)
+        files = cache.get(dir_path, key)
+        if files is None:
+            files = list(self._scan_entries(dir_path))
+            cache.put(dir_path, key, files)
+        return files
+
+    def _scan_entries(self, dir_path: str) -> Iterator[Tuple[str, float, int]]:
+        """
+        Yields the name, modified time and size of each entry as os.scandir produces it.
+
+        Args:
+            dir_path (str): The path of the directory to read.
         """
-        files = []
         with os.scandir(dir_path) as it:
             for entry in it:
-                name = entry.name
                 stats = entry.stat()
-                last_modified = time.ctime(stats.st_mtime)
-                size = self.human_readable_size(stats.st_size) if human_readable else stats.st_size
-                files.append((name, last_modified, size))
-
-        if sort_by_modified_time:
-            # Sort by modified time
-            files.sort(key=lambda x: x[1], reverse=True)
-
-        for name, last_modified, size in files:
-            print(f"{name:20} {last_modified:20} {size:10}")
+                yield entry.name, stats.st_mtime, stats.st_size
 
     def human_readable_size(self, size: int, decimal_places: int = 2) -> str:
         """
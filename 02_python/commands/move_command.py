@@ -33,8 +33,8 @@ class MoveCommand(BaseCommand):
             # if -v is given, print the file transition process.
             # It does not matter whether the transition was successful.
             if '-v' in self.options:
-                print("%s: moving '%s' to '%s'" 
-                      %(self.name, self.source_dir, self.destination_dir))
+                self.print("%s: moving '%s' to '%s'" 
+                           %(self.name, self.source_dir, self.destination_dir))
             
             # Check if the file exists in the source directory.
             if not self.file_exists(self.current_path, self.source_dir):
@@ -42,15 +42,18 @@ class MoveCommand(BaseCommand):
             
             origin = os.path.join(self.current_path, self.source_dir)
             target = os.path.join(self.current_path, self.destination_dir)
+            # Cached listings of the source and destination directories will be stale
+            BaseCommand.directory_cache.invalidate(os.path.dirname(origin), target, os.path.dirname(target))
             copy = os.path.join(self.current_path, self.destination_dir, self.source_dir)
             
             # If -i is given and the file already exists in the destination directory,
             # provide the overwrite option (y/n).
             if '-i' in self.options:
                 if self.file_exists(self.destination_dir, self.source_dir):
-                    print("%s: overwrite '%s'? (y/n)"
-                          %(self.name, self.source_dir))
+                    self.print("%s: overwrite '%s'? (y/n)"
+                               %(self.name, self.source_dir))
                 
+                    self.output.flush()
                     answer = input(">> ")
                     if answer == "y":
                         os.remove(copy)
@@ -66,13 +69,15 @@ class MoveCommand(BaseCommand):
                     shutil.move(origin, target)
 
         except FileNotFoundError as e:
-            print("%s: '%s' does not exist."
-                  %(self.name, self.source_dir))
+            self.print("%s: '%s' does not exist."
+                       %(self.name, self.source_dir))
         except FileExistsError as e:
-            print("%s: cannot move '%s' to '%s': Destination path '%s' already exists."
-                  %(self.name, self.source_dir, self.destination_dir,
-                    os.path.join(self.destination_dir, self.source_dir)
+            self.print("%s: cannot move '%s' to '%s': Destination path '%s' already exists."
+                       %(self.name, self.source_dir, self.destination_dir,
+                         os.path.join(self.destination_dir, self.source_dir)
             ))
+        finally:
+            self.output.flush()
     
     def file_exists(self, directory: str, file_name: str) -> bool:
         """
@@ -30,4 +30,5 @@ class PrintWorkingDirectoryCommand(BaseCommand):
         TODO 8-2: Implement the functionality to print the current working directory.
         No need to handle exceptions.
         """
-        print(BaseCommand.current_path)
+        self.print(BaseCommand.current_path)
+        self.output.flush()
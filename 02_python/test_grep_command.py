@@ -1,8 +1,11 @@
 import unittest
 import os
+import re
 import tempfile
 from io import StringIO
 import sys
+import threading
+import time
 from commands.grep_command import GrepCommand
 
 class TestGrepCommand(unittest.TestCase):
@@ -35,6 +38,189 @@ class TestGrepCommand(unittest.TestCase):
         output = sys.stdout.getvalue().strip()
         self.assertIn("3:Grep test line", output)
 
+    def test_grep_command_multiple_files(self):
+        # Create a second file, and a binary file that also contains the pattern
+        temp_dir = tempfile.mkdtemp()
+        second_file = os.path.join(temp_dir, "second.txt")
+        binary_file = os.path.join(temp_dir, "binary.bin")
+        with open(second_file, 'w') as f:
+            f.write("No match here\nGrep again\n")
+        with open(binary_file, 'wb') as f:
+            f.write(b"Grep\0binary\n")
+
+        command = GrepCommand(options=['-n'],
+                              args=["Grep", self.temp_file.name, second_file, binary_file, "missing.txt"])
+        command.execute()
+
+        # Output follows the argument order, and the binary file is skipped
+        output = sys.stdout.getvalue().strip().split("\n")
+        self.assertEqual(output, [
+            f"{self.temp_file.name}:3:Grep test line",
+            f"{second_file}:2:Grep again",
+            "grep: missing.txt: No such file or directory",
+        ])
+
+        os.remove(second_file)
+        os.remove(binary_file)
+        os.rmdir(temp_dir)
+
+    def test_grep_command_recursive(self):
+        # Create a directory tree with matches in a nested directory
+        temp_dir = tempfile.mkdtemp()
+        nested_dir = os.path.join(temp_dir, "nested")
+        os.mkdir(nested_dir)
+        paths = [os.path.join(temp_dir, "b.txt"), os.path.join(nested_dir, "a.txt"), os.path.join(temp_dir, "a.txt")]
+        for path in paths:
+            with open(path, 'w') as f:
+                f.write("Grep in " + os.path.basename(path) + "\n")
+
+        command = GrepCommand(options=['-r'], args=["Grep", temp_dir])
+        command.execute()
+
+        # Files are listed in sorted order, directory by directory
+        output = sys.stdout.getvalue().strip().split("\n")
+        self.assertEqual(output, [
+            f"{paths[2]}:Grep in a.txt",
+            f"{paths[0]}:Grep in b.txt",
+            f"{paths[1]}:Grep in a.txt",
+        ])
+
+        for path in paths:
+            os.remove(path)
+        os.rmdir(nested_dir)
+        os.rmdir(temp_dir)
+
+    def test_grep_command_recursive_skips_fifo(self):
+        # A FIFO inside a walked directory would block forever if it were opened
+        temp_dir = tempfile.mkdtemp()
+        text_file = os.path.join(temp_dir, "a.txt")
+        fifo = os.path.join(temp_dir, "b.fifo")
+        with open(text_file, 'w') as f:
+            f.write("Grep here\n")
+        os.mkfifo(fifo)
+
+        result = []
+        searcher = threading.Thread(target=lambda: result.append(
+            GrepCommand(options=['-r'], args=["Grep", temp_dir]).execute()), daemon=True)
+        searcher.start()
+        searcher.join(timeout=5)
+        blocked = searcher.is_alive()
+        if blocked:
+            # Unblock the search by opening the other end of the FIFO
+            with open(fifo, 'w'):
+                pass
+            searcher.join()
+        self.assertFalse(blocked)
+        self.assertEqual(result, [None])
+        self.assertEqual(sys.stdout.getvalue(), f"{text_file}:Grep here\n")
+
+        os.remove(text_file)
+        os.remove(fifo)
+        os.rmdir(temp_dir)
+
+    def test_grep_command_mmap_matches_line_by_line(self):
+        # Write a file with blank lines, \r and \r\n line ends, no trailing newline and a non-ASCII line
+        with open(self.temp_file.name, 'wb') as f:
+            f.write("Hello World\n\nGrep one\n  Grep two  \ncafé Grep\nx\rGrep cr\r\nmid Grep\rGrep\r\r\n"
+                    "end\nlast Grep".encode('utf-8'))
+
+        # Patterns that see the same matches in bytes skip the ASCII check, so both fast paths apply
+        for pattern in ["Grep", "café", "Grep|Hello", "[Gg]rep t", r"G\.?rep"]:
+            command = GrepCommand(options=[], args=[pattern, self.temp_file.name])
+            command._prepare_fast_path()
+            with open(self.temp_file.name, 'rb') as f:
+                self.assertIsNotNone(command._search_mapped(f, re.compile(pattern), False, None), pattern)
+
+        # The memory-mapped path must print exactly what the line-by-line path prints
+        for pattern in ["Grep", "o W", "café", "^Grep", "Grep|Hello", "^(mid|last) ", r"G\w+p\s", "[Gg]rep t",
+                        "[^ ]Grep", "x.G", ""]:
+            for options in ([], ['-n']):
+                outputs = []
+                for use_mmap in (False, True):
+                    sys.stdout = StringIO()
+                    command = GrepCommand(options=options, args=[pattern, self.temp_file.name])
+                    command.use_mmap = use_mmap
+                    command.execute()
+                    outputs.append(sys.stdout.getvalue())
+                self.assertEqual(outputs[0], outputs[1], (pattern, options))
+
+    def test_grep_command_buffered_output(self):
+        # Write enough matching lines to flush the shared output several times
+        with open(self.temp_file.name, 'w') as f:
+            f.writelines(f"Grep {i}\n" for i in range(1000))
+
+        output = GrepCommand.output
+        buffer_size, output.buffer_size = output.buffer_size, 100
+        try:
+            command = GrepCommand(options=[], args=["Grep", self.temp_file.name])
+            command.execute()
+        finally:
+            output.buffer_size = buffer_size
+        self.assertEqual(sys.stdout.getvalue(), "".join(f"Grep {i}\n" for i in range(1000)))
+
+    def test_grep_command_flushes_before_waiting(self):
+        class SlowGrep(GrepCommand):
+            def search_file(self, path, *args):
+                # The second file stays busy until the first file's match reaches the stream
+                if path == "slow":
+                    deadline = time.monotonic() + 2
+                    while not sys.stdout.getvalue() and time.monotonic() < deadline:
+                        time.sleep(0.01)
+                    seen.append(sys.stdout.getvalue())
+                    return []
+                return super().search_file(path, *args)
+
+        seen = []
+        SlowGrep(options=[], args=["Grep", self.temp_file.name, "slow"]).execute()
+        self.assertEqual(seen, [f"{self.temp_file.name}:Grep test line\n"])
+
+    def test_grep_command_broken_pipe(self):
+        class ClosedPipe(StringIO):
+            def write(self, text):
+                raise BrokenPipeError()
+
+        # A closed reader stops the output without raising, and later output is discarded
+        output = GrepCommand.output
+        output.stream = ClosedPipe()
+        try:
+            GrepCommand(options=[], args=["Grep", self.temp_file.name]).execute()
+            self.assertTrue(output.broken)
+            GrepCommand(options=[], args=["Grep", self.temp_file.name]).execute()
+        finally:
+            output.stream = None
+            output.broken = False
+        self.assertEqual(sys.stdout.getvalue(), "")
+
+    def test_grep_command_pipe(self):
+        # A FIFO cannot seek back after the binary check or be memory-mapped, so it must be read as a stream
+        temp_dir = tempfile.mkdtemp()
+        fifo = os.path.join(temp_dir, "fifo")
+        os.mkfifo(fifo)
+
+        def write_fifo():
+            with open(fifo, 'w') as f:
+                f.write("x\nGrep me\n")
+
+        for use_mmap in (False, True):
+            sys.stdout = StringIO()
+            writer = threading.Thread(target=write_fifo)
+            writer.start()
+            command = GrepCommand(options=['-n'], args=["Grep", fifo])
+            command.use_mmap = use_mmap
+            command.execute()
+            writer.join()
+            self.assertEqual(sys.stdout.getvalue(), "2:Grep me\n", use_mmap)
+
+        os.remove(fifo)
+        os.rmdir(temp_dir)
+
+    @unittest.skipUnless(os.path.exists('/proc/self/status'), "requires /proc")
+    def test_grep_command_zero_size_special_file(self):
+        # /proc files report a size of 0 but are not empty
+        command = GrepCommand(options=[], args=["^Name:", '/proc/self/status'])
+        command.execute()
+        self.assertTrue(sys.stdout.getvalue().startswith("Name:"))
+
     def tearDown(self):
         sys.stdout = self.held
         os.remove(self.temp_file.name)  # Remove the temporary file
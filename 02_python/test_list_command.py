@@ -2,6 +2,7 @@ import unittest
 import os
 import tempfile
 from commands.list_command import ListCommand
+from commands.copy_command import CopyCommand
 from io import StringIO
 import sys
 
@@ -32,6 +33,74 @@ class TestListCommand(unittest.TestCase):
         self.assertIn("hello.txt", output)
         self.assertIn("qwe.txt", output)
 
+    def test_list_files_detailed_cache(self):
+        cache = ListCommand.directory_cache
+        hits, misses = cache.hits, cache.misses
+
+        # The directory was just changed, so its mtime cannot be trusted yet and it is not cached
+        for _ in range(2):
+            ListCommand(options=['-l'], args=[self.temp_dir]).execute()
+        self.assertEqual((cache.hits - hits, cache.misses - misses), (0, 2))
+        self.assertNotIn(self.temp_dir, cache.dirs)
+
+        # The second listing of an unchanged directory comes from the cache
+        os.utime(self.temp_dir, (1000000000, 1000000000))
+        hits, misses = cache.hits, cache.misses
+        outputs = []
+        for _ in range(2):
+            sys.stdout = StringIO()
+            ListCommand(options=['-l'], args=[self.temp_dir]).execute()
+            outputs.append(sys.stdout.getvalue())
+        self.assertIn("hello.txt", outputs[0])
+        self.assertEqual(outputs[0], outputs[1])
+        self.assertEqual((cache.hits - hits, cache.misses - misses), (1, 1))
+
+        # A new entry changes the directory, so it is scanned again
+        new_file = os.path.join(self.temp_dir, "new.txt")
+        with open(new_file, 'w') as f:
+            f.write("New")
+        sys.stdout = StringIO()
+        ListCommand(options=['-l'], args=[self.temp_dir]).execute()
+        self.assertIn("new.txt", sys.stdout.getvalue())
+        self.assertEqual(cache.misses - misses, 2)
+
+        # cp (like mv) drops the cached listings it touches
+        copied_file = os.path.join(self.temp_dir, "copied.txt")
+        CopyCommand(options=[], args=[new_file, copied_file]).execute()
+        self.assertNotIn(self.temp_dir, cache.dirs)
+        os.remove(new_file)
+        os.remove(copied_file)
+
+    def test_list_files_pagination(self):
+        # Pages follow the order of the full listing
+        ListCommand(options=[], args=[self.temp_dir]).execute()
+        names = sys.stdout.getvalue().split()
+        for options, expected in [(['--limit=1'], names[:1]), (['--offset=1'], names[1:]),
+                                  (['--offset=1', '--limit=5'], names[1:2]), (['--limit=0'], [])]:
+            sys.stdout = StringIO()
+            ListCommand(options=options, args=[self.temp_dir]).execute()
+            self.assertEqual(sys.stdout.getvalue().split(), expected, options)
+
+        sys.stdout = StringIO()
+        ListCommand(options=['--limit=x'], args=[self.temp_dir]).execute()
+        self.assertEqual(sys.stdout.getvalue(), "ls: invalid --limit value 'x'\n")
+
+    def test_list_files_newest_with_limit(self):
+        # Give the files distinct modified times, qwe.txt being the newest
+        os.utime(self.temp_file1, (1000000000, 1000000000))
+        os.utime(self.temp_file2, (1100000000, 1100000000))
+
+        for stream in ([], ['--stream']):
+            outputs = []
+            for options in (['-l', '-t'], ['-l', '-t', '--limit=1'], ['-l', '-t', '--offset=1', '--limit=1']):
+                sys.stdout = StringIO()
+                ListCommand(options=options + stream, args=[self.temp_dir]).execute()
+                outputs.append(sys.stdout.getvalue().splitlines())
+            self.assertEqual(len(outputs[0]), 2)
+            self.assertTrue(outputs[0][0].startswith("qwe.txt"))
+            self.assertEqual(outputs[1], outputs[0][:1])
+            self.assertEqual(outputs[2], outputs[0][1:])
+
     def tearDown(self):
         # Restore the output buffer
         sys.stdout = self.held